@@ -0,0 +1,138 @@
+"""Startup-time benchmark.
+
+Times each phase from a cold interpreter to the first completed run: the
+src imports, building the object graph with main.create_handler, the SQL
+logins plus HTTP warm-up, and a small first run. Every repeat is a fresh
+subprocess so nothing is cached between them:
+
+    python benchmarks/startup.py --login-latency 0.2 --repeat 5
+
+--serial-connect logs in and warms up one step at a time, for comparison
+with the concurrent default.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+PHASES = ('import_ms', 'create_handler_ms', 'connect_ms', 'first_run_ms')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--units', type=int, default=10,
+                        help='rows in the first run')
+    parser.add_argument('--login-latency', type=float, default=0.1,
+                        help='seconds each SQL login blocks for')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--serial-connect', action='store_true')
+    parser.add_argument('--output', help='append JSON results to this file')
+    parser.add_argument('--run-one', action='store_true',
+                        help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def serial_connect(handler):
+    pool = handler.conn_holder.pool
+    entries = [await pool.acquire() for _ in range(pool.min_size)]
+    for entry in entries:
+        pool.release(entry)
+    await handler.xml_handler.warm_up()
+
+
+async def run_one(args):
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, SRC)
+
+    from stubs import SoapStub, install_fake_pymssql
+    driver = install_fake_pymssql(
+        args.units, login_latency=args.login_latency
+    )
+    logging.disable(logging.INFO)
+
+    start = perf_counter()
+    from holders import ConfigHolder, HolderFactory
+    from main import create_handler
+    imported = perf_counter()
+
+    config_holder = HolderFactory.create_holder(ConfigHolder)
+    stub = SoapStub(config_holder)
+    config_holder.url = await stub.start()
+
+    start_handler = perf_counter()
+    handler = create_handler()
+    created = perf_counter()
+    logins_before_connect = driver.logins
+
+    try:
+        if args.serial_connect:
+            await serial_connect(handler)
+        else:
+            await handler.connect()
+        connected = perf_counter()
+        await handler.handle()
+        finished = perf_counter()
+    finally:
+        await handler.close()
+        await stub.stop()
+
+    return {
+        'serial_connect': args.serial_connect,
+        'import_ms': round((imported - start) * 1000, 1),
+        'create_handler_ms': round((created - start_handler) * 1000, 1),
+        'connect_ms': round((connected - created) * 1000, 1),
+        'first_run_ms': round((finished - connected) * 1000, 1),
+        'logins_before_connect': logins_before_connect
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(asyncio.run(run_one(args))))
+        return
+
+    child_args = [
+        '--run-one',
+        '--units', str(args.units),
+        '--login-latency', str(args.login_latency)
+    ]
+    if args.serial_connect:
+        child_args.append('--serial-connect')
+
+    results = []
+    for _ in range(args.repeat):
+        proc = subprocess.run(
+            [sys.executable, __file__, *child_args],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    medians = {
+        phase: round(statistics.median(r[phase] for r in results), 1)
+        for phase in PHASES
+    }
+    print(
+        '  '.join(f'{phase} {medians[phase]:>8}' for phase in PHASES)
+        + f"  total {round(sum(medians.values()), 1):>8}"
+        + f"  logins before connect {results[-1]['logins_before_connect']}"
+    )
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
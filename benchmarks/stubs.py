@@ -0,0 +1,190 @@
+import asyncio
+import random
+import re
+import sys
+import time
+import types
+
+CASE_ID_RE = re.compile(rb'<case_id>(\d+)</case_id>')
+
+
+class FakeCursor:
+    def __init__(self, conn, as_dict=False):
+        self.conn = conn
+        self.as_dict = as_dict
+        self.rows = iter(())
+        self.rowcount = 0
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.conn.statements += 1
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return
+
+        rows = self.conn.driver.rows
+        columns = self.conn.driver.columns
+        self.description = [(c, None) for c in columns]
+        self.rowcount = rows
+        self.rows = (
+            self._row(columns, self.conn.driver.make_row(i))
+            for i in range(rows)
+        )
+
+    def _row(self, columns, values):
+        return dict(zip(columns, values)) if self.as_dict else values
+
+    def callproc(self, proc, params=()):
+        self.conn.statements += 1
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchmany(self, size=1):
+        return [row for _, row in zip(range(size), self.rows)]
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, driver):
+        self.driver = driver
+        self.statements = 0
+
+    def cursor(self, as_dict=False):
+        return FakeCursor(self, as_dict)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def install_fake_pymssql(rows, columns=('AssetID', 'Case_ID',
+                                        'flag_last_on_hrs'),
+                         login_latency=0.0):
+    """Register an in-memory stand-in for pymssql under its real name.
+
+    Must run before anything from src is imported. Each connect() blocks
+    for login_latency seconds, like a real login round trip.
+    """
+    driver = types.ModuleType('pymssql')
+    driver.rows = rows
+    driver.columns = columns
+    driver.logins = 0
+    driver.make_row = lambda i: (i + 1, 100_000 + i, 24)
+
+    def connect(**kwargs):
+        driver.logins += 1
+        time.sleep(login_latency)
+        return FakeConnection(driver)
+
+    driver.connect = connect
+    sys.modules['pymssql'] = driver
+    return driver
+
+
+class SoapStub:
+    def __init__(
+        self,
+        config_holder,
+        latency: float = 0.0,
+        payload_size: int = 256,
+        fault_rate: float = 0.0,
+        children: int = 2,
+        capacity: int = None
+    ):
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.fault_rate = fault_rate
+        self.children = children
+        self.padding = 'x' * payload_size
+        self.env, self.body = (
+            config_holder.soap_env, config_holder.soap_body
+        )
+        self.response = config_holder.ns1_response.format(
+            call=config_holder.call
+        )
+        self.return_key = config_holder.return_key
+        self.record_key = (config_holder.keys or ['record'])[0]
+        self.fault = config_holder.soap_fault
+        self.fault_string = config_holder.fault_string
+        self.runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        case_ids = CASE_ID_RE.findall(await request.read())
+        # Past its capacity the stub sheds load the way a rate-limited
+        # vendor would.
+        if self.capacity is not None and self.in_flight >= self.capacity:
+            return web.Response(status=503)
+
+        self.in_flight += 1
+        try:
+            if self.latency:
+                await asyncio.sleep(random.expovariate(1 / self.latency))
+        finally:
+            self.in_flight -= 1
+
+        if random.random() < self.fault_rate:
+            return web.Response(
+                body=self._envelope(
+                    f'<{self.fault}><faultcode>Server</faultcode>'
+                    f'<{self.fault_string}>stub fault'
+                    f'</{self.fault_string}></{self.fault}>'
+                ),
+                status=500,
+                content_type='text/xml'
+            )
+
+        returns = ''.join(
+            f'<{self.return_key}>{self._records(int(case_id))}'
+            f'</{self.return_key}>'
+            for case_id in case_ids
+        )
+        return web.Response(
+            body=self._envelope(
+                f'<{self.response}>{returns}</{self.response}>'
+            ),
+            content_type='text/xml'
+        )
+
+    def _records(self, case_id):
+        return ''.join(
+            f'<{self.record_key}><child_case_id>{case_id}-{n}'
+            f'</child_case_id><vendor>stub</vendor>'
+            f'<assigned_date>2024-01-{n % 28 + 1:02d} 08:30:00'
+            f'</assigned_date><notes>{self.padding}</notes>'
+            f'</{self.record_key}>'
+            for n in range(self.children)
+        )
+
+    def _envelope(self, body):
+        return (
+            f'<?xml version="1.0" encoding="utf-8"?><{self.env} '
+            f'xmlns:{self.env.split(":")[0]}="urn:stub">'
+            f'<{self.body}>{body}</{self.body}></{self.env}>'
+        ).encode()
+
+    async def start(self, host='127.0.0.1', port=0):
+        # Imported here so startup.py can time src imports without aiohttp
+        # already loaded.
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post('/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f'http://{host}:{port}/soap'
+
+    async def stop(self):
+        await self.runner.cleanup()
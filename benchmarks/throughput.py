@@ -0,0 +1,179 @@
+"""End-to-end throughput benchmark.
+
+Runs the object graph from main.create_handler against a local SOAP stub
+and an in-memory pymssql stand-in, one subprocess per batch size so each
+peak RSS figure is independent:
+
+    python benchmarks/throughput.py --units 1000 10000 100000 --latency 0.05
+"""
+import argparse
+import ast
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--units', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000])
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='mean stub response latency in seconds')
+    parser.add_argument('--payload-size', type=int, default=256,
+                        help='padding bytes per child-case record')
+    parser.add_argument('--fault-rate', type=float, default=0.0)
+    parser.add_argument('--children', type=int, default=2,
+                        help='child-case records per response')
+    parser.add_argument('--capacity', type=int,
+                        help='concurrent requests the stub serves before '
+                             'answering 503')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='FIELD=VALUE',
+                        help='override a ConfigHolder field, e.g. '
+                             'pipeline=True')
+    parser.add_argument('--output', help='append JSON results to this file')
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def apply_overrides(config_holder, overrides):
+    for override in overrides:
+        name, value = override.split('=', 1)
+        current = getattr(config_holder, name)
+        if isinstance(current, bool):
+            value = value.lower() in ('1', 'true', 'yes')
+        elif current is not None:
+            value = type(current)(value)
+        else:
+            with contextlib.suppress(ValueError, SyntaxError):
+                value = ast.literal_eval(value)
+        setattr(config_holder, name, value)
+
+
+async def run_one(args):
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, SRC)
+
+    from stubs import SoapStub, install_fake_pymssql
+    install_fake_pymssql(args.run_one)
+    logging.disable(logging.INFO)
+
+    from holders import ConfigHolder, HolderFactory
+    from main import create_handler
+
+    config_holder = HolderFactory.create_holder(ConfigHolder)
+    apply_overrides(config_holder, args.set)
+    stub = SoapStub(
+        config_holder,
+        latency=args.latency,
+        payload_size=args.payload_size,
+        fault_rate=args.fault_rate,
+        children=args.children,
+        capacity=args.capacity
+    )
+    config_holder.url = await stub.start()
+
+    handler = create_handler()
+    xml_getter = handler.xml_handler.xml_getter
+    get_xml_batch = xml_getter._get_xml_batch
+    latencies = []
+
+    async def timed_get_xml_batch(session, total, batch):
+        start = perf_counter()
+        try:
+            return await get_xml_batch(session, total, batch)
+        finally:
+            latencies.extend([perf_counter() - start] * len(batch))
+
+    xml_getter._get_xml_batch = timed_get_xml_batch
+
+    error = None
+    start = perf_counter()
+    try:
+        await handler.handle()
+    except Exception as ex:
+        error = f'{type(ex).__name__}: {ex}'
+    finally:
+        elapsed = perf_counter() - start
+        handler.report_metrics()
+        await handler.close()
+        await stub.stop()
+
+    counters = handler.metrics.summary()['counters']
+    percentiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1
+        else [latencies[0]] * 99 if latencies else [0.0] * 99
+    )
+    return {
+        'units': args.run_one,
+        'seconds': round(elapsed, 3),
+        'cases_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+        'peak_rss_mb': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        'retries': counters.get('soap_retries', 0),
+        'failures': counters.get('soap_failures', 0),
+        'error': error
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_one is not None:
+        print(json.dumps(asyncio.run(run_one(args))))
+        return
+
+    child_args = [
+        '--latency', str(args.latency),
+        '--payload-size', str(args.payload_size),
+        '--fault-rate', str(args.fault_rate),
+        '--children', str(args.children)
+    ]
+    if args.capacity is not None:
+        child_args += ['--capacity', str(args.capacity)]
+    for override in args.set:
+        child_args += ['--set', override]
+
+    results = []
+    for units in args.units:
+        proc = subprocess.run(
+            [sys.executable, __file__, '--run-one', str(units),
+             *child_args],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(
+            f"{result['units']:>8} units  "
+            f"{result['cases_per_second']:>9} cases/s  "
+            f"p50 {result['p50_ms']:>8} ms  "
+            f"p99 {result['p99_ms']:>8} ms  "
+            f"peak RSS {result['peak_rss_mb']:>8} MB  "
+            f"retries {result['retries']:>6}  "
+            f"failures {result['failures']:>6}"
+            + (f"  error: {result['error']}" if result['error'] else '')
+        )
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import zlib
+from dataclasses import replace
+
+from holders import ConfigHolder, HolderFactory
+from loggers import EventLogger
+
+
+def shard_of(asset_id, shards):
+    return zlib.crc32(str(asset_id).encode()) % shards
+
+
+def partition(rows, shards):
+    parts = [[] for _ in range(shards)]
+    for row in rows:
+        parts[shard_of(row['AssetID'], shards)].append(row)
+    return [part for part in parts if part]
+
+
+def shard_config(config_holder, shards):
+    # Shards split the SOAP concurrency rather than multiplying it, so the
+    # third party sees the same load as a single-process run.
+    return replace(
+        config_holder,
+        fetch_workers=max(1, config_holder.fetch_workers // shards),
+        conn_limit=max(1, config_holder.conn_limit // shards),
+        conn_limit_per_host=max(
+            1, config_holder.conn_limit_per_host // shards
+        ),
+        concurrency_max=max(1, config_holder.concurrency_max // shards),
+        request_rate=(
+            config_holder.request_rate / shards
+            if config_holder.request_rate else None
+        ),
+        metrics_dir=None
+    )
+
+
+def run_shard(create_handler, config_holder, shard, rows):
+    if config_holder.profile_dir:
+        config_holder = replace(
+            config_holder,
+            profile_dir=os.path.join(
+                config_holder.profile_dir, f'shard-{shard}'
+            )
+        )
+    HolderFactory.holder_dict[ConfigHolder] = config_holder
+    return asyncio.run(_run_shard(create_handler(), shard, rows))
+
+
+async def _run_shard(handler, shard, rows):
+    try:
+        await handler.handle_rows(rows)
+    finally:
+        handler.write_profile()
+        await handler.close()
+
+    handler.logger.log_info(
+        f' Shard {shard}: {len(rows)} rows, '
+        f'{len(handler.data_holder.failed_case_ids)} failed case_ids.'
+    )
+    return (
+        handler.metrics.summary(),
+        handler.data_holder.failed_case_ids,
+        handler.data_holder.faults
+    )
+
+
+class Backfill:
+    def __init__(self, handler, create_handler, shards=None):
+        self.handler = handler
+        self.create_handler = create_handler
+        self.shards = (
+            shards or handler.config_holder.backfill_shards
+            or os.cpu_count() or 1
+        )
+        self.logger = EventLogger()
+
+    async def run(self):
+        # Only backfill runs pay for importing multiprocessing.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        handler = self.handler
+        handler.metrics.reset()
+
+        if not await handler.load_rows():
+            return False
+
+        parts = partition(handler.data_holder.database_data, self.shards)
+        if not parts:
+            return True
+
+        config_holder = shard_config(handler.config_holder, len(parts))
+        self.logger.log_info(
+            f' Backfilling {len(handler.data_holder.database_data)} rows '
+            f'in {len(parts)} shards.'
+        )
+
+        # Spawned workers open their own SQL and HTTP connections instead of
+        # inheriting the parent's through fork.
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(
+            len(parts), multiprocessing.get_context('spawn')
+        ) as executor, handler.metrics.stage(
+            'backfill', len(handler.data_holder.database_data)
+        ) as stage:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    executor, run_shard, self.create_handler,
+                    config_holder, shard, rows
+                )
+                for shard, rows in enumerate(parts)
+            ))
+            stage.rows_out = sum(len(rows) for rows in parts)
+
+        for summary, failed_case_ids, faults in results:
+            handler.metrics.merge(summary)
+            handler.data_holder.failed_case_ids.extend(failed_case_ids)
+            handler.data_holder.faults.extend(faults)
+
+        handler.finish_checkpoint()
+
+        if handler.data_holder.failed_case_ids:
+            self.logger.log_error(
+                f'{len(handler.data_holder.failed_case_ids)} case_ids '
+                f'failed across shards: '
+                f'{handler.data_holder.failed_case_ids}'
+            )
+        return True
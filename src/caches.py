@@ -0,0 +1,90 @@
+import pickle
+import sqlite3
+from collections import OrderedDict
+from time import time
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = None,
+        ttl: float = 86400,
+        max_entries: int = 10_000
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = self._open(path) if path else None
+
+    def _open(self, path):
+        db = sqlite3.connect(path)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'call TEXT, case_id TEXT, stored_at REAL, payload BLOB, '
+            'PRIMARY KEY (call, case_id))'
+        )
+        return db
+
+    def get(self, call, case_id):
+        key = (call, str(case_id))
+        now = time()
+
+        entry = self.memory.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry[1]
+
+        if self.db is not None:
+            row = self.db.execute(
+                'SELECT stored_at, payload FROM responses '
+                'WHERE call = ? AND case_id = ?',
+                key
+            ).fetchone()
+            if row is not None and now - row[0] < self.ttl:
+                xml = pickle.loads(row[1])
+                self._remember(key, row[0], xml)
+                self.disk_hits += 1
+                return xml
+
+        self.misses += 1
+        return None
+
+    def set(self, call, case_id, xml):
+        key = (call, str(case_id))
+        now = time()
+        self._remember(key, now, xml)
+
+        if self.db is not None:
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                (*key, now, pickle.dumps(xml, pickle.HIGHEST_PROTOCOL))
+            )
+
+    def _remember(self, key, stored_at, xml):
+        self.memory[key] = (stored_at, xml)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def flush(self):
+        if self.db is not None:
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def stats(self):
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
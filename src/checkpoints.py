@@ -0,0 +1,79 @@
+import hashlib
+import sqlite3
+import threading
+from time import time
+
+
+class Checkpoint:
+    def __init__(self, path: str = 'checkpoint.sqlite3'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = self._open(path)
+
+    def _open(self, path):
+        # SqlExecutor records chunks from the SQL write thread, and backfill
+        # shards share the file from separate processes.
+        db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS cases ('
+            'case_id TEXT PRIMARY KEY, completed_at REAL)'
+        )
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'digest TEXT PRIMARY KEY, committed_at REAL)'
+        )
+        db.commit()
+        return db
+
+    @staticmethod
+    def digest(chunk):
+        text = chunk if isinstance(chunk, str) else repr(chunk)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def completed_cases(self):
+        with self.lock:
+            return {
+                row[0] for row in self.db.execute('SELECT case_id FROM cases')
+            }
+
+    def complete_cases(self, case_ids):
+        now = time()
+        with self.lock:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO cases VALUES (?, ?)',
+                ((str(id), now) for id in case_ids if id)
+            )
+            self.db.commit()
+
+    def has_chunk(self, digest):
+        with self.lock:
+            return self.db.execute(
+                'SELECT 1 FROM chunks WHERE digest = ?', (digest,)
+            ).fetchone() is not None
+
+    def commit_chunk(self, digest, case_ids=()):
+        # The chunk and the case_ids it finishes are recorded together.
+        now = time()
+        with self.lock:
+            self.db.execute(
+                'INSERT OR IGNORE INTO chunks VALUES (?, ?)', (digest, now)
+            )
+            self.db.executemany(
+                'INSERT OR IGNORE INTO cases VALUES (?, ?)',
+                ((str(id), now) for id in case_ids if id)
+            )
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM cases')
+            self.db.execute('DELETE FROM chunks')
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
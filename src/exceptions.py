@@ -4,3 +4,11 @@ class ProcessingError(Exception):
 
 class Continue(Exception):
     pass
+
+
+class SoapRequestError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
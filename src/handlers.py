@@ -1,9 +1,20 @@
-from holders import DataHolder, HolderFactory
+import asyncio
+import contextlib
+import inspect
+import itertools
+import json
+from collections.abc import Sized
+
+from checkpoints import Checkpoint
+from holders import ConfigHolder, DataHolder
 from interfaces import (IConnectionHolder, IDatabaseOperation, IDataProcessor,
                         ISoapOperation)
+from ledgers import ChangeLedger
+from loggers import EventLogger
+from metrics import RunMetrics
 from operations import SqlExecutor, SqlGetter, XmlGetter
-from processors import (CaseIdExtractor, DataNormalizer, SqlStringCreator,
-                        XmlProcessor)
+from processors import (AssetIdExtractor, CaseIdExtractor, DataNormalizer,
+                        SqlStringCreator, XmlProcessor)
 
 
 class SqlHandler:
@@ -15,11 +26,14 @@ class SqlHandler:
         self.sql_getter = sql_getter
         self.sql_executor = sql_executor
 
-    def get_sql(self):
-        self.sql_getter.execute()
+    async def get_sql(self):
+        return await self.sql_getter.execute_async()
+
+    def stream_sql(self):
+        return self.sql_getter.stream()
 
-    def execute_sql(self):
-        self.sql_executor.execute()
+    async def execute_sql(self):
+        await self.sql_executor.execute_async()
 
 
 class XmlHandler:
@@ -32,6 +46,15 @@ class XmlHandler:
     def get_xml(self):
         return self.xml_getter.execute()
 
+    def stream_xml(self, case_ids, on_result):
+        return self.xml_getter.fetch(case_ids, on_result)
+
+    async def warm_up(self):
+        await self.xml_getter.warm_up()
+
+    async def close(self):
+        await self.xml_getter.close()
+
 
 class DataProcessor:
     def __init__(
@@ -69,10 +92,14 @@ class EventTypeHandler:
             self,
             conn_holder: IConnectionHolder,
             data_holder: DataHolder,
-            config_holder: HolderFactory,
+            config_holder: ConfigHolder,
             sql_handler: IDatabaseOperation,
             xml_handler: ISoapOperation,
-            data_processor: IDataProcessor
+            data_processor: IDataProcessor,
+            metrics: RunMetrics = None,
+            checkpoint: Checkpoint = None,
+            ledger: ChangeLedger = None,
+            profiler=None
     ):
         self.conn_holder = conn_holder
         self.data_holder = data_holder
@@ -80,13 +107,308 @@ class EventTypeHandler:
         self.sql_handler = sql_handler
         self.xml_handler = xml_handler
         self.data_processor = data_processor
+        self.metrics = metrics or RunMetrics()
+        self.checkpoint = checkpoint
+        self.ledger = ledger
+        self.profiler = profiler
+        self.logger = EventLogger()
 
     async def handle(self):
-        self.sql_handler.get_sql()
-        self.data_processor.extract_case_ids()
-        await self.xml_handler.get_xml()
-        self.data_processor.process_xml()
-        self.data_processor.extract_asset_ids()
-        self.data_processor.normalize_data()
-        self.data_processor.create_sql_string()
-        self.sql_handler.execute_sql()
+        self.metrics.reset()
+        await self._stage('connect', self.connect)
+
+        if self.config_holder.pipeline and self.config_holder.stream_rows:
+            if not await self._handle_streamed():
+                return False
+        elif await self.load_rows():
+            await self._process_rows()
+        else:
+            return False
+
+        self.finish_checkpoint()
+        return True
+
+    async def handle_rows(self, rows):
+        self.metrics.reset()
+        await self._stage('connect', self.connect)
+        self.data_holder.database_data = rows
+        await self._process_rows()
+        return True
+
+    async def load_rows(self):
+        completed = self._begin_checkpoint()
+
+        if not await self._stage(
+            'get_sql', self.sql_handler.get_sql,
+            rows_out='database_data'
+        ):
+            return False
+
+        if completed is not None:
+            self._skip_completed(self.data_holder, completed)
+        return True
+
+    async def connect(self):
+        await asyncio.gather(
+            self.conn_holder.connect(),
+            self.xml_handler.warm_up()
+        )
+
+    def finish_checkpoint(self):
+        # Failed case_ids keep the checkpoint so --resume retries only them.
+        if self.checkpoint is None or self.data_holder.failed_case_ids:
+            return
+        self.checkpoint.clear()
+
+    async def close(self):
+        await self.xml_handler.close()
+        self.conn_holder.close()
+
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+        if self.ledger is not None:
+            self.ledger.close()
+
+    def report_metrics(self):
+        summary = self.metrics.summary()
+        self.logger.log_info(
+            f' Run metrics: {json.dumps(summary["stages"])} '
+            f'{json.dumps(summary["counters"])}'
+        )
+
+        if self.config_holder.metrics_dir:
+            self.metrics.write(self.config_holder.metrics_dir)
+        self.write_profile()
+
+    def write_profile(self):
+        if self.profiler is not None:
+            self.profiler.write()
+
+    async def _stage(self, name, step, rows_in=None, rows_out=None):
+        with self._measure(
+            name, self._rows(self.data_holder, rows_in)
+        ) as stage:
+            result = step()
+            if inspect.isawaitable(result):
+                result = await result
+            stage.rows_out = self._rows(self.data_holder, rows_out)
+        return result
+
+    def _measure(self, name, rows_in=0):
+        return self._profile(name, self.metrics.stage(name, rows_in))
+
+    def _profile(self, name, timer=None):
+        timer = timer or contextlib.nullcontext()
+        if self.profiler is None:
+            return timer
+        return self.profiler.stage(name, timer)
+
+    def _rows(self, data, attr=None):
+        if attr:
+            data = getattr(data, attr)
+        return len(data) if isinstance(data, Sized) else 0
+
+    def _begin_checkpoint(self):
+        if self.checkpoint is None:
+            return None
+        if not self.config_holder.resume:
+            self.checkpoint.clear()
+            return None
+        return self.checkpoint.completed_cases()
+
+    def _skip_completed(self, data_holder, completed):
+        rows = data_holder.database_data
+        data_holder.database_data = [
+            d for d in rows if str(d.get('Case_ID')) not in completed
+        ]
+
+        skipped = len(rows) - len(data_holder.database_data)
+        if skipped:
+            self.metrics.incr('checkpoint_skipped_cases', skipped)
+            self.logger.log_info(
+                f' Resuming: skipped {skipped} completed case_ids.'
+            )
+
+    def _complete_cases(self, data_holder):
+        # Only committed records go into the ledger, so a failed write is
+        # retried on the next run.
+        if self.ledger is not None and data_holder.ledger_pending:
+            self.ledger.record(data_holder.ledger_pending)
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete_cases(
+                d.get('Case_ID') for d in data_holder.database_data or ()
+            )
+
+    async def _process_rows(self):
+        if self.config_holder.pipeline:
+            return await self._handle_pipelined()
+
+        await self._stage(
+            'extract_case_ids', self.data_processor.extract_case_ids,
+            'database_data', 'case_ids'
+        )
+        await self._stage(
+            'get_xml', self.xml_handler.get_xml, 'case_ids', 'xml_data'
+        )
+        await self._stage(
+            'process_xml', self.data_processor.process_xml,
+            'xml_data', 'xml_data'
+        )
+        await self._stage(
+            'extract_asset_ids', self.data_processor.extract_asset_ids,
+            'database_data', 'asset_ids'
+        )
+        await self._stage(
+            'normalize_data', self.data_processor.normalize_data,
+            'xml_data', 'xml_data'
+        )
+        await self._stage(
+            'create_sql_string', self.data_processor.create_sql_string,
+            'xml_data'
+        )
+        await self._stage('execute_sql', self.sql_handler.execute_sql)
+        self._complete_cases(self.data_holder)
+
+    async def _handle_pipelined(self):
+        await self._stage(
+            'extract_case_ids', self.data_processor.extract_case_ids,
+            'database_data', 'case_ids'
+        )
+
+        rows, blank = {}, []
+        for db_data, case_id in zip(
+            self.data_holder.database_data, self.data_holder.case_ids
+        ):
+            if case_id:
+                rows[len(rows)] = (db_data, case_id)
+            else:
+                blank.append(db_data)
+
+        await self._run_pipeline(
+            rows, blank, [case_id for _, case_id in rows.values()]
+        )
+
+    async def _handle_streamed(self):
+        rows, blank = {}, []
+        index = itertools.count()
+        await self._run_pipeline(
+            rows, blank, self._stream_case_ids(rows, blank, index)
+        )
+        return next(index) > 0 or bool(blank)
+
+    async def _stream_case_ids(self, rows, blank, index):
+        completed = self._begin_checkpoint()
+        batches = self.sql_handler.stream_sql()
+
+        while True:
+            with self._measure('get_sql') as stage:
+                batch = await anext(batches, None)
+                stage.rows_out = len(batch) if batch else 0
+            if batch is None:
+                return
+
+            batch_holder = DataHolder(database_data=batch)
+            if completed is not None:
+                self._skip_completed(batch_holder, completed)
+
+            with self._measure(
+                'extract_case_ids', len(batch_holder.database_data)
+            ) as stage:
+                CaseIdExtractor(batch_holder).process()
+                stage.rows_out = len(batch_holder.case_ids)
+
+            for db_data, case_id in zip(
+                batch_holder.database_data, batch_holder.case_ids
+            ):
+                if case_id:
+                    rows[next(index)] = (db_data, case_id)
+                    yield case_id
+                else:
+                    blank.append(db_data)
+
+    async def _run_pipeline(self, rows, blank, case_ids):
+        fetched = asyncio.Queue(self.config_holder.pipeline_queue_size)
+        processed = asyncio.Queue(
+            self.config_holder.pipeline_write_queue_size
+        )
+
+        stages = [
+            asyncio.create_task(self._fetch_stage(case_ids, fetched)),
+            asyncio.create_task(
+                self._process_stage(rows, blank, fetched, processed)
+            ),
+            asyncio.create_task(self._write_stage(processed))
+        ]
+
+        # The stages overlap, so they are profiled together.
+        with self._profile('pipeline'):
+            try:
+                await asyncio.gather(*stages)
+            finally:
+                for stage in stages:
+                    stage.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+
+    async def _fetch_stage(self, case_ids, fetched):
+        async def put(i, xml):
+            stage.rows_out += 1
+            await fetched.put((i, xml))
+
+        with self._measure('get_xml', self._rows(case_ids)) as stage:
+            await self.xml_handler.stream_xml(case_ids, put)
+            stage.rows_in = stage.rows_in or stage.rows_out
+        await fetched.put(None)
+
+    async def _process_stage(self, rows, blank, fetched, processed):
+        batch = []
+
+        while (item := await fetched.get()) is not None:
+            batch.append(item)
+            if len(batch) >= self.config_holder.pipeline_batch_size:
+                await processed.put(self._process_batch(rows, batch))
+                batch = []
+
+        # Rows without a Case_ID have nothing to fetch, but XmlProcessor
+        # still checks their flag hours, as it does in barrier mode.
+        if batch or blank:
+            await processed.put(self._process_batch(rows, batch, blank))
+        await processed.put(None)
+
+    def _process_batch(self, rows, batch, blank=()):
+        batch_holder = DataHolder(
+            database_data=[*(rows.pop(i)[0] for i, _ in batch), *blank],
+            xml_data=[xml for _, xml in batch]
+        )
+
+        for name, processor, rows_in, rows_out in (
+            ('process_xml', XmlProcessor(batch_holder, self.config_holder),
+             'xml_data', 'xml_data'),
+            ('extract_asset_ids', AssetIdExtractor(batch_holder),
+             'database_data', 'asset_ids'),
+            ('normalize_data', DataNormalizer(batch_holder),
+             'xml_data', 'xml_data'),
+            ('create_sql_string',
+             SqlStringCreator(
+                 batch_holder, self.config_holder, self.ledger, self.metrics
+             ),
+             'xml_data', None)
+        ):
+            with self._measure(
+                name, self._rows(batch_holder, rows_in)
+            ) as stage:
+                processor.process()
+                stage.rows_out = self._rows(batch_holder, rows_out)
+
+        self.data_holder.faults.extend(batch_holder.faults)
+        return batch_holder
+
+    async def _write_stage(self, processed):
+        while (batch_holder := await processed.get()) is not None:
+            with self._measure('execute_sql'):
+                await SqlExecutor(
+                    batch_holder, self.conn_holder, self.config_holder,
+                    self.metrics, self.checkpoint
+                ).execute_async()
+            self._complete_cases(batch_holder)
@@ -1,11 +1,18 @@
-from dataclasses import dataclass, field
+import os
+from contextlib import asynccontextmanager
+from dataclasses import MISSING, dataclass, field, fields
 from typing import Any
 
 from config import (CCF_TABLE, FAULT_STRING, FC, FC_KEY, FLAG_HOUR_LIMIT,
-                    NS1_RESPONSE, PC_CC_UPSERT_PROC, RETURN_KEY, SOAP_BODY,
-                    SOAP_ENV, SOAP_FAULT, SQL_INSERT_LIMIT, URL, XML_TEMPLATE)
-from connect_sql import connection, pymssql_conn
+                    HISTORICAL_RUN, NS1_RESPONSE, PC_CC_UPSERT_PROC,
+                    RETURN_KEY, SOAP_BODY, SOAP_ENV, SOAP_FAULT,
+                    SQL_INSERT_LIMIT, URL, XML_TEMPLATE)
+from connect_sql import connection
+from exceptions import ProcessingError
 from interfaces import IConnectionHolder
+from metrics import RunMetrics
+from pools import ConnectionPool
+from resilience import RetryPolicy
 
 CALL = FC
 KEYS = FC_KEY
@@ -29,6 +36,69 @@ class ConfigHolder:
     return_key: str = RETURN_KEY
     soap_fault: str = SOAP_FAULT
     fault_string: str = FAULT_STRING
+    fetch_workers: int = 20
+    fetch_queue_size: int = 100
+    conn_limit: int = 100
+    conn_limit_per_host: int = 20
+    keepalive_timeout: float = 30
+    connect_timeout: float = 10
+    request_timeout: float = 60
+    stream_xml: bool = False
+    stream_chunk_size: int = 65536
+    xml_fast_path: bool = False
+    soap_batch_size: int = 1
+    soap_batch_request: str = '<ns:get{call}>%s</ns:get{call}>'
+    soap_batch_case: str = '<case_id>%i</case_id>'
+    soap_content_type: str = 'text/plain; charset=utf-8'
+    accept_encoding: str = 'gzip, deflate'
+    request_compression: str = None
+    pipeline: bool = False
+    pipeline_batch_size: int = 50
+    pipeline_queue_size: int = 100
+    pipeline_write_queue_size: int = 4
+    parameterised_sql: bool = False
+    proc_params: tuple = ('ColumnString', 'ValueString', 'AssetIDString')
+    poll_interval_min: float = 30
+    poll_interval_max: float = 900
+    poll_backoff: float = 2
+    cache_enabled: bool = False
+    cache_path: str = 'soap_cache.sqlite3'
+    cache_ttl: float = 86400
+    cache_max_entries: int = 10_000
+    metrics_dir: str = None
+    retry_attempts: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 10
+    retry_statuses: tuple = (429, 502, 503, 504)
+    breaker_failure_threshold: int = 20
+    breaker_reset_timeout: float = 30
+    adaptive_concurrency: bool = False
+    concurrency_min: int = 1
+    concurrency_max: int = 100
+    concurrency_backoff: float = 0.9
+    concurrency_tolerance: float = 2.0
+    concurrency_latency_target: float = None
+    request_rate: float = None
+    request_burst: int = 1
+    compact_records: bool = False
+    stream_rows: bool = False
+    sql_fetch_size: int = 1000
+    backfill_shards: int = None
+    checkpoint_enabled: bool = HISTORICAL_RUN
+    checkpoint_path: str = 'checkpoint.sqlite3'
+    resume: bool = False
+    sql_pool_min_size: int = 2
+    sql_pool_max_size: int = 4
+    sql_check_idle: float = 30
+    sql_connect_attempts: int = 5
+    sql_connect_base_delay: float = 1
+    sql_connect_max_delay: float = 60
+    skip_unchanged: bool = False
+    change_ledger_path: str = 'change_ledger.sqlite3'
+    change_key_fields: tuple = ('AssetID', 'child_case_id')
+    profile_dir: str = field(
+        default_factory=lambda: os.environ.get('CHILDCASE_PULL_PROFILE')
+    )
 
 
 @dataclass
@@ -36,34 +106,100 @@ class DataHolder:
     database_data: Any = None
     case_ids: list = field(default_factory=lambda: [])
     asset_ids: list = field(default_factory=lambda: [])
+    failed_case_ids: list = field(default_factory=lambda: [])
+    faults: list = field(default_factory=lambda: [])
     xml_data: Any = None
     sql_string: str = None
+    sql_params: Any = None
+    ledger_pending: list = field(default_factory=lambda: [])
+    chunk_case_ids: list = field(default_factory=lambda: [])
+
+    def reset(self):
+        for f in fields(self):
+            setattr(
+                self,
+                f.name,
+                f.default if f.default_factory is MISSING
+                else f.default_factory()
+            )
 
 
 class ConnectionHolder(IConnectionHolder):
-    def __init__(self):
-        self.cnxn_cur, self.conn = (
-            connection(),
-            pymssql_conn()
+    def __init__(
+        self,
+        config_holder: ConfigHolder = None,
+        metrics: RunMetrics = None,
+        connect=connection
+    ):
+        config_holder = config_holder or ConfigHolder()
+        # Reads and writes share one pool. A streamed read holds its
+        # connection between batches while the pipeline writes, so there
+        # are always at least two.
+        self.pool = ConnectionPool(
+            connect,
+            config_holder.sql_pool_min_size,
+            max(2, config_holder.sql_pool_max_size),
+            config_holder.sql_check_idle,
+            RetryPolicy(
+                config_holder.sql_connect_attempts,
+                config_holder.sql_connect_base_delay,
+                config_holder.sql_connect_max_delay
+            ),
+            metrics
         )
 
     def get_conn(self):
-        return self.conn
+        return self._current().conn
 
     def get_cnxn_cur(self):
-        return self.cnxn_cur
+        entry = self._current()
+        return entry.conn, entry.cur
+
+    async def connect(self):
+        await self.pool.fill()
+
+    async def run_read(self, func, *args):
+        return await self.pool.run(func, *args)
+
+    async def run_write(self, func, *args):
+        return await self.pool.run(func, *args)
+
+    @asynccontextmanager
+    async def session(self):
+        async with self.pool.checkout() as entry:
+            yield lambda func, *args: self.pool.run_on(entry, func, *args)
+
+    def close(self):
+        self.pool.close()
+
+    def _current(self):
+        entry = self.pool.current()
+        if entry is None:
+            raise ProcessingError(
+                'SQL connections are only available inside run_read, '
+                'run_write or session'
+            )
+        return entry
 
 
 class HolderFactory:
-    holder_dict = {
-        ConnectionHolder: ConnectionHolder(),
-        DataHolder: DataHolder(),
-        ConfigHolder: ConfigHolder()
+    holder_factories = {
+        ConnectionHolder: lambda: ConnectionHolder(
+            HolderFactory.create_holder(ConfigHolder),
+            HolderFactory.create_holder(RunMetrics)
+        ),
+        DataHolder: DataHolder,
+        ConfigHolder: ConfigHolder,
+        RunMetrics: RunMetrics
     }
+    holder_dict = {}
 
     @staticmethod
     def create_holder(holder_type):
-        if holder_type in HolderFactory.holder_dict:
-            return HolderFactory.holder_dict[holder_type]
-        else:
+        if holder_type not in HolderFactory.holder_factories:
             raise ValueError('Invalid holder type')
+        if holder_type not in HolderFactory.holder_dict:
+            HolderFactory.holder_dict[holder_type] = (
+                HolderFactory.holder_factories[holder_type]()
+            )
+        return HolderFactory.holder_dict[holder_type]
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 
 
 class IDatabaseOperation(ABC):
@@ -6,6 +7,9 @@ class IDatabaseOperation(ABC):
     def execute(self):
         pass
 
+    async def execute_async(self):
+        return self.execute()
+
 
 class ISoapOperation(ABC):
     @abstractmethod
@@ -21,6 +25,24 @@ class IConnectionHolder(ABC):
     def get_cnxn_cur(self):
         pass
 
+    async def connect(self):
+        pass
+
+    @abstractmethod
+    async def run_read(self, func, *args):
+        pass
+
+    @abstractmethod
+    async def run_write(self, func, *args):
+        pass
+
+    @asynccontextmanager
+    async def session(self):
+        yield self.run_read
+
+    def close(self):
+        pass
+
 
 class IDataProcessor(ABC):
     @abstractmethod
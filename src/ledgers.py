@@ -0,0 +1,95 @@
+import hashlib
+import sqlite3
+import threading
+from time import time
+
+from loggers import EventLogger
+
+
+class ChangeLedger:
+    def __init__(
+        self,
+        path: str = 'change_ledger.sqlite3',
+        key_fields: tuple = ('AssetID', 'child_case_id')
+    ):
+        self.path = path
+        self.key_fields = key_fields
+        self.missing_fields = set()
+        self.logger = EventLogger()
+        self.lock = threading.Lock()
+        self.db = self._open(path)
+
+    def _open(self, path):
+        # Backfill shards write to the same file from separate processes.
+        db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'key TEXT PRIMARY KEY, digest BLOB, written_at REAL)'
+        )
+        db.commit()
+        return db
+
+    def key(self, record):
+        missing = [k for k in self.key_fields if k not in record]
+        if missing:
+            self._warn_missing(missing)
+            # Without its key fields a record can only be found again by
+            # its content, so a changed record is written as a new one.
+            return self.digest(record).hex()
+        return '\x1f'.join(str(record[k]) for k in self.key_fields)
+
+    @staticmethod
+    def digest(record):
+        return hashlib.blake2b(
+            repr(list(record.items())).encode(), digest_size=16
+        ).digest()
+
+    def changed(self, records):
+        entries = [(self.key(r), self.digest(r), r) for r in records]
+        written = self._written({key for key, _, _ in entries})
+        changed, pending = [], {}
+        for key, digest, record in entries:
+            if written.get(key) != digest:
+                changed.append(record)
+                pending[key] = digest
+        return changed, list(pending.items())
+
+    def record(self, pending):
+        now = time()
+        with self.lock:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?)',
+                ((key, digest, now) for key, digest in pending)
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _written(self, keys, chunk=500):
+        keys = list(keys)
+        written = {}
+        with self.lock:
+            for i in range(0, len(keys), chunk):
+                part = keys[i:i + chunk]
+                written.update(self.db.execute(
+                    'SELECT key, digest FROM records WHERE key IN '
+                    f'({",".join("?" * len(part))})',
+                    part
+                ))
+        return written
+
+    def _warn_missing(self, missing):
+        missing = set(missing) - self.missing_fields
+        if missing:
+            self.missing_fields |= missing
+            self.logger.log_error(
+                f'Change ledger key fields {sorted(missing)} are missing '
+                'from records; keying them by content instead. Check '
+                'change_key_fields.'
+            )
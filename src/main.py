@@ -1,78 +1,229 @@
+import argparse
 import asyncio
 from datetime import datetime
 from time import time
 
+from backfill import Backfill
+from checkpoints import Checkpoint
 from exceptions import ProcessingError
 from handlers import DataProcessor, EventTypeHandler, SqlHandler, XmlHandler
 from holders import ConfigHolder, ConnectionHolder, DataHolder, HolderFactory
+from ledgers import ChangeLedger
 from loggers import EventLogger
+from metrics import RunMetrics
 from operations import SqlExecutor, SqlGetter, XmlGetter
 from processors import (AssetIdExtractor, CaseIdExtractor, DataNormalizer,
                         SqlStringCreator, XmlProcessor)
 from traceback_logger import traceback_logger
 
 
+def create_handler():
+    conn_holder = HolderFactory.create_holder(ConnectionHolder)
+    data_holder = HolderFactory.create_holder(DataHolder)
+    config_holder = HolderFactory.create_holder(ConfigHolder)
+    metrics = HolderFactory.create_holder(RunMetrics)
+    checkpoint = (
+        Checkpoint(config_holder.checkpoint_path)
+        if config_holder.checkpoint_enabled else None
+    )
+    ledger = (
+        ChangeLedger(
+            config_holder.change_ledger_path, config_holder.change_key_fields
+        )
+        if config_holder.skip_unchanged else None
+    )
+    profiler = None
+    if config_holder.profile_dir:
+        # Imported only when asked for, so normal runs skip tracemalloc.
+        from profiling import StageProfiler
+        profiler = StageProfiler(config_holder.profile_dir)
+
+    sql_getter = SqlGetter(data_holder, conn_holder, config_holder, metrics)
+    sql_executor = SqlExecutor(
+        data_holder, conn_holder, config_holder, metrics, checkpoint
+    )
+    sql_handler = SqlHandler(
+        sql_getter,
+        sql_executor
+    )
+
+    xml_getter = XmlGetter(data_holder, config_holder, metrics)
+    xml_handler = XmlHandler(
+        xml_getter
+    )
+
+    case_id_extractor = CaseIdExtractor(data_holder)
+    xml_processor = XmlProcessor(data_holder, config_holder)
+    asset_id_extractor = AssetIdExtractor(data_holder)
+    data_normalizer = DataNormalizer(data_holder)
+    sql_string_creator = SqlStringCreator(
+        data_holder, config_holder, ledger, metrics
+    )
+    data_processor = DataProcessor(
+        case_id_extractor,
+        xml_processor,
+        asset_id_extractor,
+        data_normalizer,
+        sql_string_creator
+    )
+
+    return EventTypeHandler(
+        conn_holder,
+        data_holder,
+        config_holder,
+        sql_handler,
+        xml_handler,
+        data_processor,
+        metrics,
+        checkpoint,
+        ledger,
+        profiler
+    )
+
+
 async def main():
     logger = EventLogger()
     logger.log_info(f' {datetime.now()}')
     start = time()
 
     try:
-        conn_holder = HolderFactory.create_holder(ConnectionHolder)
-        data_holder = HolderFactory.create_holder(DataHolder)
-        config_holder = HolderFactory.create_holder(ConfigHolder)
+        handler = create_handler()
 
-        sql_getter = SqlGetter(data_holder, conn_holder, config_holder)
-        sql_executor = SqlExecutor(data_holder, conn_holder)
-        sql_handler = SqlHandler(
-            sql_getter,
-            sql_executor
-        )
+        try:
+            await handler.handle()
+        finally:
+            handler.report_metrics()
+            await handler.close()
 
-        xml_getter = XmlGetter(data_holder, config_holder)
-        xml_handler = XmlHandler(
-            xml_getter
+    except ProcessingError as pe:
+        logger.log_error(f'ProcessingError occurred: {pe}')
+    except Exception as ex:
+        traceback_logger('FC', ex)
+    finally:
+        end = time()
+        logger.log_info('FC up to date.')
+        logger.log_info(
+            f'ChildCasePull completed in {round((end - start)/60, 2)} minutes '
+            f'on {datetime.now()}.'
         )
 
-        case_id_extractor = CaseIdExtractor(data_holder)
-        xml_processor = XmlProcessor(data_holder, config_holder)
-        asset_id_extractor = AssetIdExtractor(data_holder)
-        data_normalizer = DataNormalizer(data_holder)
-        sql_string_creator = SqlStringCreator(data_holder, config_holder)
-        data_processor = DataProcessor(
-            case_id_extractor,
-            xml_processor,
-            asset_id_extractor,
-            data_normalizer,
-            sql_string_creator
-        )
 
-        handler = EventTypeHandler(
-            conn_holder,
-            data_holder,
-            config_holder,
-            sql_handler,
-            xml_handler,
-            data_processor
-        )
+async def backfill(shards=None):
+    logger = EventLogger()
+    logger.log_info(f' {datetime.now()}')
+    start = time()
+
+    try:
+        handler = create_handler()
 
-        await handler.handle()
+        try:
+            await Backfill(handler, create_handler, shards).run()
+        finally:
+            handler.report_metrics()
+            await handler.close()
 
     except ProcessingError as pe:
         logger.log_error(f'ProcessingError occurred: {pe}')
     except Exception as ex:
         traceback_logger('FC', ex)
     finally:
-        end = time()
-        logger.log_info('FC up to date.')
         logger.log_info(
-            f'ChildCasePull completed in {round((end - start)/60, 2)} minutes '
-            f'on {datetime.now()}.'
+            f'ChildCasePull backfill completed in '
+            f'{round((time() - start)/60, 2)} minutes on {datetime.now()}.'
         )
 
 
+async def daemon():
+    logger = EventLogger()
+    handler = create_handler()
+    config_holder = handler.config_holder
+    interval = config_holder.poll_interval_min
+
+    try:
+        while True:
+            start = time()
+            flagged = False
+
+            try:
+                flagged = await handler.handle()
+            except ProcessingError as pe:
+                logger.log_error(f'ProcessingError occurred: {pe}')
+            except Exception as ex:
+                traceback_logger('FC', ex)
+            finally:
+                handler.report_metrics()
+                handler.data_holder.reset()
+
+            if flagged:
+                interval = max(
+                    config_holder.poll_interval_min,
+                    interval / config_holder.poll_backoff
+                )
+                logger.log_info(
+                    f'ChildCasePull cycle completed in '
+                    f'{round((time() - start)/60, 2)} minutes '
+                    f'on {datetime.now()}.'
+                )
+            else:
+                interval = min(
+                    config_holder.poll_interval_max,
+                    interval * config_holder.poll_backoff
+                )
+
+            logger.log_info(f' Next poll in {round(interval)} seconds.')
+            await asyncio.sleep(interval)
+    finally:
+        await handler.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='keep running and poll for new flags on an adaptive interval'
+    )
+    parser.add_argument(
+        '--backfill',
+        action='store_true',
+        help='split the run into AssetID shards, one worker process each'
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        help='number of backfill shards (default: CPU count)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='skip case_ids and SQL chunks the last run already committed'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='profiles',
+        metavar='DIR',
+        help='write per-stage cProfile stats and allocation reports to DIR '
+             '(default: profiles; env: CHILDCASE_PULL_PROFILE)'
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
+    if args.resume:
+        config_holder = HolderFactory.create_holder(ConfigHolder)
+        config_holder.checkpoint_enabled = config_holder.resume = True
+
+    if args.profile:
+        HolderFactory.create_holder(ConfigHolder).profile_dir = args.profile
+
     try:
-        asyncio.run(main())
+        asyncio.run(
+            daemon() if args.daemon
+            else backfill(args.shards) if args.backfill
+            else main()
+        )
     except Exception as ex:
         traceback_logger('MAIN')
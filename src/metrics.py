@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter, time
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for le, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield le, total
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'buckets': {str(le): n for le, n in self.cumulative()}
+        }
+
+
+class Stage:
+    __slots__ = ('calls', 'seconds', 'rows_in', 'rows_out')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out
+        }
+
+
+class StageTimer:
+    __slots__ = ('rows_in', 'rows_out')
+
+    def __init__(self, rows_in):
+        self.rows_in = rows_in
+        self.rows_out = 0
+
+
+class RunMetrics:
+    def __init__(self, prefix: str = 'childcase_pull'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time()
+            self.stages = {}
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        timer = StageTimer(rows_in)
+        start = perf_counter()
+        try:
+            yield timer
+        finally:
+            elapsed = perf_counter() - start
+            with self.lock:
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = Stage()
+                stage.calls += 1
+                stage.seconds += elapsed
+                stage.rows_in += timer.rows_in or 0
+                stage.rows_out += timer.rows_out or 0
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def merge(self, summary):
+        with self.lock:
+            for name, other in summary['stages'].items():
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = Stage()
+                stage.calls += other['calls']
+                stage.seconds += other['seconds']
+                stage.rows_in += other['rows_in']
+                stage.rows_out += other['rows_out']
+
+            for name, value in summary['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+            self.gauges.update(summary['gauges'])
+
+            for name, other in summary['histograms'].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                previous = 0
+                for i, total in enumerate(other['buckets'].values()):
+                    histogram.counts[i] += total - previous
+                    previous = total
+                histogram.count += other['count']
+                histogram.sum += other['sum']
+
+    def summary(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'seconds': round(time() - self.started, 6),
+                'stages': {k: v.to_dict() for k, v in self.stages.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {
+                    k: v.to_dict() for k, v in self.histograms.items()
+                }
+            }
+
+    def to_prometheus(self):
+        summary = self.summary()
+        p = self.prefix
+        lines = [
+            f'# TYPE {p}_last_run_timestamp_seconds gauge',
+            f'{p}_last_run_timestamp_seconds {summary["started"]}',
+            f'# TYPE {p}_run_seconds gauge',
+            f'{p}_run_seconds {summary["seconds"]}'
+        ]
+
+        for field in ('calls', 'seconds', 'rows_in', 'rows_out'):
+            lines.append(f'# TYPE {p}_stage_{field} gauge')
+            lines.extend(
+                f'{p}_stage_{field}{{stage="{name}"}} {stage[field]}'
+                for name, stage in summary['stages'].items()
+            )
+
+        for name, value in summary['counters'].items():
+            lines.append(f'# TYPE {p}_{name}_total counter')
+            lines.append(f'{p}_{name}_total {value}')
+
+        for name, value in summary['gauges'].items():
+            lines.append(f'# TYPE {p}_{name} gauge')
+            lines.append(f'{p}_{name} {value}')
+
+        for name, histogram in summary['histograms'].items():
+            lines.append(f'# TYPE {p}_{name} histogram')
+            lines.extend(
+                f'{p}_{name}_bucket{{le="{le}"}} {count}'
+                for le, count in histogram['buckets'].items()
+            )
+            lines.append(f'{p}_{name}_sum {histogram["sum"]}')
+            lines.append(f'{p}_{name}_count {histogram["count"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self._write_atomic(
+            os.path.join(directory, f'{self.prefix}.json'),
+            json.dumps(self.summary(), indent=2)
+        )
+        self._write_atomic(
+            os.path.join(directory, f'{self.prefix}.prom'),
+            self.to_prometheus()
+        )
+
+    def _write_atomic(self, path, text):
+        # The textfile collector must never see a half-written file.
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
@@ -1,28 +1,149 @@
 
 import asyncio
-from collections import deque
+import gzip
+import itertools
+import zlib
+from collections.abc import AsyncIterable, Sized
+from contextlib import contextmanager, suppress
+from time import perf_counter
+from urllib.parse import urlsplit
 
 import aiohttp
 
 import xmltodict
+from caches import ResponseCache
+from checkpoints import Checkpoint
 from config import HISTORICAL_QUERY, HISTORICAL_RUN, NON_HISTORICAL_QUERY
-from connect_sql import execute_commit_sql, pymssql_query
+from connect_sql import (execute_commit_proc, execute_commit_sql,
+                         pymssql_query)
+from exceptions import SoapRequestError
 from holders import ConfigHolder, DataHolder
 from interfaces import IConnectionHolder, IDatabaseOperation, ISoapOperation
 from loggers import EventLogger
+from metrics import RunMetrics
+from records import Record, RecordSchema
+from resilience import (AdaptiveLimit, CircuitBreaker, RetryPolicy,
+                        TokenBucket)
+
+RETRYABLE_ERRORS = (
+    aiohttp.ClientError, asyncio.TimeoutError, SoapRequestError
+)
+REQUEST_ENCODINGS = ('gzip', 'deflate')
 
 
 class XmlGetter(ISoapOperation):
     def __init__(
         self,
         data_holder: DataHolder,
-        config_holder: ConfigHolder
+        config_holder: ConfigHolder,
+        metrics: RunMetrics = None
     ):
         self.data_holder = data_holder
         self.call = config_holder.call
         self.url = config_holder.url
         self.xml = config_holder.xml_template % '\
         <ns:get{call}><case_id>%i</case_id></ns:get{call}>'
+        self.request_prefix, self.request_suffix = self._compile(
+            self.xml.format(call=self.call), '%i'
+        )
+        self.batch_prefix, self.batch_suffix = self._compile(
+            (
+                config_holder.xml_template % config_holder.soap_batch_request
+            ).format(call=self.call),
+            '%s'
+        )
+        self.case_prefix, self.case_suffix = self._compile(
+            config_holder.soap_batch_case, '%i'
+        )
+        self.soap_batch_size = config_holder.soap_batch_size
+        self.request_compression = config_holder.request_compression
+        if self.request_compression and (
+            self.request_compression not in REQUEST_ENCODINGS
+        ):
+            raise ValueError(
+                f'Unsupported request_compression '
+                f'{self.request_compression!r}; use one of {REQUEST_ENCODINGS}'
+            )
+        self.request_headers = {
+            'Content-Type': config_holder.soap_content_type,
+            'Accept-Encoding': config_holder.accept_encoding,
+            **(
+                {'Content-Encoding': self.request_compression}
+                if self.request_compression else {}
+            )
+        }
+        self.fetch_workers = config_holder.fetch_workers
+        self.fetch_queue_size = config_holder.fetch_queue_size
+        self.conn_limit = config_holder.conn_limit
+        self.conn_limit_per_host = config_holder.conn_limit_per_host
+        self.keepalive_timeout = config_holder.keepalive_timeout
+        self.connect_timeout = config_holder.connect_timeout
+        self.request_timeout = config_holder.request_timeout
+        self.stream_xml = config_holder.stream_xml
+        self.stream_chunk_size = config_holder.stream_chunk_size
+        self.keys = config_holder.keys
+        self.soap_env = config_holder.soap_env
+        self.soap_body = config_holder.soap_body
+        self.ns1_response = config_holder.ns1_response.format(call=self.call)
+        self.return_key = config_holder.return_key
+        self.soap_fault = config_holder.soap_fault
+        self.fault_string = config_holder.fault_string
+        self.xml_fast_path = config_holder.xml_fast_path
+        self.item_path = (
+            self.soap_env, self.soap_body, self.ns1_response,
+            *((self.return_key,) if self.keys else ())
+        )
+        self.path_parsers = {}
+        self.cache = (
+            ResponseCache(
+                config_holder.cache_path,
+                config_holder.cache_ttl,
+                config_holder.cache_max_entries
+            ) if config_holder.cache_enabled else None
+        )
+        self.retry_policy = RetryPolicy(
+            config_holder.retry_attempts,
+            config_holder.retry_base_delay,
+            config_holder.retry_max_delay
+        )
+        self.retry_statuses = config_holder.retry_statuses
+        self.circuit_breaker = CircuitBreaker(
+            config_holder.breaker_failure_threshold,
+            config_holder.breaker_reset_timeout
+        )
+        # The adaptive limit decides how many requests are in flight, up to
+        # concurrency_max workers; otherwise the worker count is fixed.
+        self.concurrency_limit = (
+            AdaptiveLimit(
+                config_holder.fetch_workers,
+                config_holder.concurrency_min,
+                config_holder.concurrency_max,
+                config_holder.concurrency_backoff,
+                config_holder.concurrency_tolerance,
+                config_holder.concurrency_latency_target
+            ) if config_holder.adaptive_concurrency else None
+        )
+        self.max_workers = (
+            self.concurrency_limit.max_limit
+            if self.concurrency_limit is not None else self.fetch_workers
+        )
+        if self.concurrency_limit is not None:
+            # Requests queued in the connector would count as vendor
+            # latency, so the connector never caps below the adaptive
+            # limit. 0 stays unlimited.
+            self.conn_limit = self.conn_limit and max(
+                self.conn_limit, self.max_workers
+            )
+            self.conn_limit_per_host = self.conn_limit_per_host and max(
+                self.conn_limit_per_host, self.max_workers
+            )
+        self.rate_limit = (
+            TokenBucket(
+                config_holder.request_rate, config_holder.request_burst
+            ) if config_holder.request_rate else None
+        )
+        self.session = None
+        self.metrics = metrics or RunMetrics()
         self.logger = EventLogger()
 
     @property
@@ -37,50 +158,526 @@ class XmlGetter(ISoapOperation):
     def xml_data(self, new_xml_data):
         self.data_holder.xml_data = new_xml_data
 
+    @property
+    def failed_case_ids(self):
+        return self.data_holder.failed_case_ids
+
     async def execute(self):
         xml_list = await self._get_all_xml()
         self.xml_data = xml_list
 
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+        if self.cache is not None:
+            self.cache.close()
+
+    async def warm_up(self):
+        # Runs while SQL logs in, so the first request doesn't also pay for
+        # the session and the host lookup.
+        self._get_session()
+        url = urlsplit(self.url)
+        with suppress(OSError, ValueError):
+            await asyncio.get_running_loop().getaddrinfo(
+                url.hostname, url.port or url.scheme
+            )
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.conn_limit,
+                    limit_per_host=self.conn_limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=self.request_timeout,
+                    sock_connect=self.connect_timeout
+                )
+            )
+        return self.session
+
+    def _compile(self, template, placeholder):
+        # Request bodies are spliced from bytes, so templates are formatted
+        # and encoded once instead of once per case_id.
+        prefix, suffix = template.split(placeholder, 1)
+        return (
+            prefix.replace('%%', '%').encode(),
+            suffix.replace('%%', '%').encode()
+        )
+
+    def _compress(self, body):
+        if self.request_compression == 'gzip':
+            return gzip.compress(body, mtime=0)
+        if self.request_compression == 'deflate':
+            return zlib.compress(body)
+        return body
+
     async def _get_all_xml(self):
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                self._get_xml(session, [i, len(self.case_ids)], id)
-                for i, id in enumerate(self.case_ids, 1) if id
-            ]
-            return await asyncio.gather(*tasks)
+        case_ids = [id for id in self.case_ids if id]
+        xml_list = [None] * len(case_ids)
+
+        async def collect(i, xml):
+            xml_list[i] = xml
+
+        await self.fetch(case_ids, collect)
+        return xml_list
+
+    async def fetch(self, case_ids, on_result):
+        # case_ids may also be an async iterator that is still being read
+        # from the database, in which case the total is unknown.
+        total = len(case_ids) if isinstance(case_ids, Sized) else None
+        if total == 0:
+            return
+        worker_count = min(self.max_workers, total or self.max_workers)
+
+        session = self._get_session()
+        queue = asyncio.Queue(self.fetch_queue_size)
+        waiting = {}
+        producer = asyncio.create_task(
+            self._enqueue(queue, case_ids, waiting)
+        )
+        drained = asyncio.create_task(self._drain(queue, producer))
+        workers = [
+            asyncio.create_task(
+                self._worker(
+                    session, queue, total or '?', waiting, on_result
+                )
+            )
+            for _ in range(worker_count)
+        ]
+
+        try:
+            done, _ = await asyncio.wait(
+                [drained, *workers],
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        finally:
+            for task in (producer, drained, *workers):
+                task.cancel()
+            await asyncio.gather(
+                producer, drained, *workers, return_exceptions=True
+            )
+
+            if self.cache is not None:
+                self.cache.flush()
+                self.logger.log_info(f' Response cache: {self.cache.stats()}')
+
+        if self.failed_case_ids:
+            self.logger.log_error(
+                f'{len(self.failed_case_ids)} case_ids failed and stay '
+                f'flagged for the next cycle: {self.failed_case_ids}'
+            )
+
+    async def _enqueue(self, queue, case_ids, waiting):
+        batch = []
+
+        async for i, id in self._unique(case_ids, waiting):
+            batch.append((i, id))
+            if len(batch) >= self.soap_batch_size:
+                await queue.put(batch)
+                batch = []
+
+        if batch:
+            await queue.put(batch)
+
+    async def _unique(self, case_ids, waiting):
+        # A repeated case_id joins the request already made for it, and the
+        # response is handed to every index that asked.
+        if isinstance(case_ids, AsyncIterable):
+            i = 0
+            async for id in case_ids:
+                if self._join(waiting, i, id):
+                    yield i, id
+                i += 1
+            return
+
+        # A list is known up front, so repeats coalesce however far apart.
+        unique = [
+            (i, id) for i, id in enumerate(case_ids)
+            if self._join(waiting, i, id)
+        ]
+        for item in unique:
+            yield item
+
+    def _join(self, waiting, i, id):
+        indices = waiting.get(id)
+        if indices is None:
+            waiting[id] = [i]
+            return True
+
+        indices.append(i)
+        self.metrics.incr('soap_coalesced')
+        return False
+
+    async def _drain(self, queue, producer):
+        await producer
+        await queue.join()
+
+    async def _worker(self, session, queue, total, waiting, on_result):
+        while True:
+            batch = await queue.get()
+            try:
+                try:
+                    xmls = await self._get_xml_batch(session, total, batch)
+                except Exception as e:
+                    for _, id in batch:
+                        self.logger.log_error(f'case_id {id} failed: {e!r}')
+                        self.metrics.incr('soap_failures')
+                        self.failed_case_ids.append(id)
+                    xmls = [None] * len(batch)
+
+                for (_, id), xml in zip(batch, xmls):
+                    for i in waiting.pop(id):
+                        await on_result(i, xml)
+            finally:
+                queue.task_done()
+
+    async def _get_xml_batch(self, session, total, batch):
+        if len(batch) == 1:
+            i, id = batch[0]
+            return [await self._get_xml(session, [i + 1, total], id)]
+
+        xmls = [self._cached(id) for _, id in batch]
+        missing = [n for n, xml in enumerate(xmls) if xml is None]
+        if missing:
+            ids = [batch[n][1] for n in missing]
+            fetched = await self._with_retries(
+                self._request_batch, session,
+                [batch[missing[0]][0] + 1, total], ids
+            )
+            for n, xml in zip(missing, fetched):
+                xmls[n] = xml
+        return xmls
 
     async def _get_xml(self, session, ii, id):
+        xml = self._cached(id)
+        if xml is not None:
+            return xml
+        return await self._with_retries(self._request_xml, session, ii, id)
+
+    def _cached(self, id):
+        if self.cache is None:
+            return None
+
+        xml = self.cache.get(self.call, id)
+        if xml is not None:
+            self.metrics.incr('soap_cache_hits')
+        return xml
+
+    async def _with_retries(self, request, *args):
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                with self.circuit_breaker.attempt(RETRYABLE_ERRORS):
+                    xml = await self._limited(request, *args)
+            except RETRYABLE_ERRORS:
+                self.metrics.set_gauge(
+                    'soap_circuit_open', int(self.circuit_breaker.is_open)
+                )
+                if attempt == self.retry_policy.attempts:
+                    raise
+                self.metrics.incr('soap_retries')
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+            else:
+                self.metrics.set_gauge('soap_circuit_open', 0)
+                return xml
+
+    async def _limited(self, request, *args):
+        if self.rate_limit is not None:
+            if await self.rate_limit.acquire():
+                self.metrics.incr('soap_rate_limited')
+
+        limit = self.concurrency_limit
+        if limit is None:
+            return await request(*args)
+
+        if limit.saturated:
+            self.metrics.incr('soap_limit_rejections')
+        started = await limit.acquire()
+        try:
+            xml = await request(*args)
+        except RETRYABLE_ERRORS:
+            limit.release(started, dropped=True)
+            raise
+        except BaseException:
+            limit.release()
+            raise
+        else:
+            limit.release(started)
+            return xml
+        finally:
+            self.metrics.set_gauge('soap_concurrency_limit', int(limit.limit))
+
+    async def _request_xml(self, session, ii, id):
         self.logger.log_info(
             f' {ii[0]} / {ii[1]}:'
             ' Getting xml from 3rd party database...'
         )
-        xml_string = self.xml.format(call=self.call) % id
+        body = self._compress(
+            b'%b%d%b' % (self.request_prefix, id, self.request_suffix)
+        )
+        self.metrics.incr('soap_bytes_sent', len(body))
+        start = perf_counter()
+
+        async with session.post(
+            self.url, data=body, headers=self.request_headers
+        ) as resp:
+            if resp.status in self.retry_statuses:
+                raise SoapRequestError(f'HTTP {resp.status} for {id}')
+
+            xml = await self._parse_response(resp)
+            self.metrics.observe(
+                'soap_latency_seconds', perf_counter() - start
+            )
+            self.metrics.incr('soap_requests')
+
+            if self.cache is not None and resp.status == 200:
+                self.cache.set(self.call, id, xml)
+            return xml
+
+    async def _request_batch(self, session, ii, ids):
+        self.logger.log_info(
+            f' {ii[0]}-{ii[0] + len(ids) - 1} / {ii[1]}:'
+            ' Getting xml from 3rd party database...'
+        )
+        body = self._compress(b''.join([
+            self.batch_prefix,
+            *(
+                b'%b%d%b' % (self.case_prefix, id, self.case_suffix)
+                for id in ids
+            ),
+            self.batch_suffix
+        ]))
+        self.metrics.incr('soap_bytes_sent', len(body))
+        start = perf_counter()
+
+        async with session.post(
+            self.url, data=body, headers=self.request_headers
+        ) as resp:
+            if resp.status in self.retry_statuses:
+                raise SoapRequestError(
+                    f'HTTP {resp.status} for {ids[0]}..{ids[-1]}'
+                )
+
+            xmls, split = self._split_batch(
+                await self._parse_response(resp, batched=True), len(ids)
+            )
+            self.metrics.observe(
+                'soap_latency_seconds', perf_counter() - start
+            )
+            self.metrics.incr('soap_requests')
+
+            # Faults, including a response that doesn't split into one
+            # return element per case_id, are always re-fetched.
+            if self.cache is not None and resp.status == 200 and split:
+                for id, xml in zip(ids, xmls):
+                    self.cache.set(self.call, id, xml)
+            return xmls
+
+    def _split_batch(self, xml, count):
+        # A batched response carries one return element per case_id, in
+        # request order; faults apply to every case_id in the batch. The
+        # flag says whether the envelopes are real return elements.
+        try:
+            response = xml[self.soap_env][self.soap_body][self.ns1_response]
+        except (KeyError, TypeError):
+            return [xml] * count, False
+
+        returns = response.get(self.return_key) if response else None
+        returns = returns if isinstance(returns, list) else [returns]
+        if len(returns) != count:
+            return [self._fault_envelope(
+                f'batched response has {len(returns)} {self.return_key} '
+                f'elements for {count} case_ids'
+            )] * count, False
+
+        return [self._envelope(return_data) for return_data in returns], True
+
+    def _count_received(self, resp, size):
+        self.metrics.incr('soap_bytes_received', size)
+        # Content-Length is the compressed size on the wire; chunked
+        # responses don't have one, so fall back to the decoded size.
+        self.metrics.incr(
+            'soap_wire_bytes_received',
+            size if resp.content_length is None else resp.content_length
+        )
+        if resp.headers.get('Content-Encoding'):
+            self.metrics.incr('soap_compressed_responses')
+
+    async def _parse_response(self, resp, batched=False):
+        if self.stream_xml and resp.status == 200:
+            return await self._stream_xml(resp, batched)
+
+        body = await resp.read()
+        self._count_received(resp, len(body))
+        if self.xml_fast_path and resp.status == 200:
+            with self._path_parser(batched) as parser:
+                return self._build_envelope(parser.parse(body), batched)
+        if self.stream_xml:
+            return xmltodict.parse(body)
+        text = body.decode(resp.get_encoding())
+        return xmltodict.parse(text)
+
+    @contextmanager
+    def _path_parser(self, batched=False):
+        # Responses are parsed concurrently when streaming, so each one
+        # borrows its own parser and hands it back for the next response.
+        path = self.item_path[:3] if batched else self.item_path
+        parsers = self.path_parsers.setdefault(path, [])
+        parser = parsers.pop() if parsers else xmltodict.PathParser(path)
+        try:
+            yield parser
+        except BaseException:
+            # The read may have failed mid-document, so the parser must not
+            # carry that document into the next response.
+            parser.reset()
+            raise
+        finally:
+            parsers.append(parser)
 
-        async with session.post(self.url, data=xml_string) as resp:
-            text = await resp.text()
-            return xmltodict.parse(text)
+    async def _feed(self, resp, parser):
+        size = 0
+        async for chunk in resp.content.iter_chunked(self.stream_chunk_size):
+            size += len(chunk)
+            parser.feed(chunk)
+        self._count_received(resp, size)
+
+    async def _stream_xml(self, resp, batched=False):
+        if self.xml_fast_path:
+            with self._path_parser(batched) as parser:
+                await self._feed(resp, parser)
+                return self._build_envelope(parser.close(), batched)
+
+        records = {}
+        item_depth = 5 if self.keys and not batched else 4
+
+        def collect(path, item):
+            names = [p[0] for p in path]
+            if names[1:4] == [
+                self.soap_body, self.ns1_response, self.return_key
+            ]:
+                records.setdefault(names[-1], []).append(item)
+            return True
+
+        parser = xmltodict.StreamParser(
+            item_depth=item_depth,
+            item_callback=collect
+        )
+        await self._feed(resp, parser)
+        parser.close()
+
+        return self._build_envelope(records, batched)
+
+    def _build_envelope(self, records, batched=False):
+        if batched:
+            return_data = records.get(self.return_key, [])
+        elif not records:
+            return_data = None
+        elif self.keys:
+            return_data = {key: records.get(key, []) for key in self.keys}
+        else:
+            return_data = records.get(self.return_key, [None])[0]
+        return self._envelope(return_data)
+
+    def _envelope(self, return_data):
+        return {
+            self.soap_env: {
+                self.soap_body: {
+                    self.ns1_response: {self.return_key: return_data}
+                }
+            }
+        }
+
+    def _fault_envelope(self, fault_string):
+        return {
+            self.soap_env: {
+                self.soap_body: {
+                    self.soap_fault: {self.fault_string: fault_string}
+                }
+            }
+        }
 
 
 class SqlExecutor(IDatabaseOperation):
     def __init__(
         self,
         data_holder: DataHolder,
-        conn_holder: IConnectionHolder
+        conn_holder: IConnectionHolder,
+        config_holder: ConfigHolder,
+        metrics: RunMetrics = None,
+        checkpoint: Checkpoint = None
     ):
         self.data_holder = data_holder
-        self.cnxn_cur = conn_holder.get_cnxn_cur()
+        self.conn_holder = conn_holder
+        self.proc = config_holder.proc
+        self.parameterised_sql = config_holder.parameterised_sql
+        self.metrics = metrics or RunMetrics()
+        self.checkpoint = checkpoint
+
+    @property
+    def cnxn_cur(self):
+        return self.conn_holder.get_cnxn_cur()
 
     @property
     def sql_string(self):
         return self.data_holder.sql_string
 
+    @property
+    def sql_params(self):
+        return self.data_holder.sql_params
+
+    async def execute_async(self):
+        return await self.conn_holder.run_write(self.execute)
+
     def execute(self):
+        if self.parameterised_sql:
+            return self._execute_params()
+
         if not self.sql_string:
             return False
 
-        deque(execute_commit_sql(
-            sql, self.cnxn_cur) for sql in self.sql_string
-        )
+        for sql, case_ids in self._with_case_ids(self.sql_string):
+            self._commit_chunk(
+                sql, case_ids, execute_commit_sql, sql, self.cnxn_cur
+            )
+
+    def _execute_params(self):
+        if not self.sql_params:
+            return False
+
+        for params, case_ids in self._with_case_ids(self.sql_params):
+            self._commit_chunk(
+                params, case_ids,
+                execute_commit_proc, self.proc, params, self.cnxn_cur
+            )
+
+    def _with_case_ids(self, chunks):
+        return zip(chunks, itertools.chain(
+            self.data_holder.chunk_case_ids, itertools.repeat(())
+        ))
+
+    def _commit_chunk(self, chunk, case_ids, func, *args):
+        if self.checkpoint is None:
+            return self._timed(func, *args)
+
+        # Each chunk checkpoints the case_ids it finishes, so --resume skips
+        # them before fetching even if the run dies before the last chunk.
+        digest = Checkpoint.digest(chunk)
+        if self.checkpoint.has_chunk(digest):
+            self.metrics.incr('sql_chunks_skipped')
+        else:
+            self._timed(func, *args)
+        self.checkpoint.commit_chunk(digest, case_ids)
+
+    def _timed(self, func, *args):
+        start = perf_counter()
+        func(*args)
+        self.metrics.observe('sql_statement_seconds', perf_counter() - start)
+        self.metrics.incr('sql_statements')
 
 
 class SqlGetter(IDatabaseOperation):
@@ -88,13 +685,22 @@ class SqlGetter(IDatabaseOperation):
         self,
         data_holder: DataHolder,
         conn_holder: IConnectionHolder,
-        config_holder: ConfigHolder
+        config_holder: ConfigHolder,
+        metrics: RunMetrics = None
     ):
         self.data_holder = data_holder
-        self.conn = conn_holder.get_conn()
+        self.conn_holder = conn_holder
         self.table = config_holder.table
+        self.compact_records = config_holder.compact_records
+        self.stream_rows = config_holder.stream_rows
+        self.sql_fetch_size = config_holder.sql_fetch_size
+        self.metrics = metrics or RunMetrics()
         self.logger = EventLogger()
 
+    @property
+    def conn(self):
+        return self.conn_holder.get_conn()
+
     @property
     def database_data(self):
         return self.data_holder.database_data
@@ -103,16 +709,57 @@ class SqlGetter(IDatabaseOperation):
     def database_data(self, new_database_data):
         self.data_holder.database_data = new_database_data
 
+    async def execute_async(self):
+        return await self.conn_holder.run_read(self.execute)
+
+    async def stream(self):
+        # The cursor belongs to one connection, so it stays checked out
+        # until the last batch is read.
+        async with self.conn_holder.session() as run:
+            cursor = await run(self._query)
+            if cursor is None:
+                return
+
+            while batch := await run(self._fetch_batch, cursor):
+                yield batch
+
     def execute(self):
+        df = self._query()
+        if df is None:
+            return False
+
+        if self.stream_rows:
+            df = [
+                row for batch in iter(lambda: self._fetch_batch(df), [])
+                for row in batch
+            ]
+        elif self.compact_records:
+            schema = RecordSchema.get(c[0] for c in df.description)
+            df = [Record(schema, list(row)) for row in df.fetchall()]
+        else:
+            df = df.fetchall()
+        self.database_data = df
+        self.logger.log_info(f' Database query returned {len(df)} rows.')
+        return True
+
+    def _query(self):
+        start = perf_counter()
         df = pymssql_query(
             self.conn,
-            HISTORICAL_QUERY if HISTORICAL_RUN else NON_HISTORICAL_QUERY
+            HISTORICAL_QUERY if HISTORICAL_RUN else NON_HISTORICAL_QUERY,
+            as_dict=not (self.compact_records or self.stream_rows)
         )
+        self.metrics.observe('sql_query_seconds', perf_counter() - start)
 
         if not HISTORICAL_RUN and df.rowcount == 0:
             self.logger.log_info(f'No new flags in {self.table}.')
-            return False
+            return None
+        return df
 
-        df = df.fetchall()
-        self.database_data = df
-        self.logger.log_info(f' Database query returned {len(df)} rows.')
+    def _fetch_batch(self, cursor):
+        start = perf_counter()
+        rows = cursor.fetchmany(self.sql_fetch_size)
+        self.metrics.observe('sql_fetch_seconds', perf_counter() - start)
+
+        schema = RecordSchema.get(c[0] for c in cursor.description)
+        return [Record(schema, list(row)) for row in rows]
@@ -0,0 +1,220 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from time import monotonic, perf_counter
+
+from exceptions import ProcessingError
+from loggers import EventLogger
+from metrics import RunMetrics
+from resilience import RetryPolicy
+
+
+class PooledConnection:
+    __slots__ = ('conn', 'cur', 'last_used', 'suspect', 'busy')
+
+    def __init__(self, conn, cur):
+        self.conn = conn
+        self.cur = cur
+        self.last_used = monotonic()
+        self.suspect = False
+        self.busy = None
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        min_size: int = 2,
+        max_size: int = 4,
+        check_idle: float = 30,
+        retry_policy: RetryPolicy = None,
+        metrics: RunMetrics = None
+    ):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.check_idle = check_idle
+        self.retry_policy = retry_policy or RetryPolicy(5, 1, 60)
+        self.metrics = metrics or RunMetrics()
+        self.logger = EventLogger()
+        # A checked-out connection is only ever used by one thread at a
+        # time, so one thread per connection is enough.
+        self.executor = ThreadPoolExecutor(self.max_size, 'sql')
+        self.local = threading.local()
+        self.idle = deque()
+        self.waiters = deque()
+        self.size = 0
+
+    def current(self):
+        return getattr(self.local, 'entry', None)
+
+    async def fill(self):
+        entries = await asyncio.gather(*(
+            self.acquire() for _ in range(self.min_size - self.size)
+        ))
+        for entry in entries:
+            self.release(entry)
+
+    async def run(self, func, *args):
+        async with self.checkout() as entry:
+            return await self.run_on(entry, func, *args)
+
+    async def run_on(self, entry, func, *args):
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._call, entry, func, args
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread keeps using the connection, so release() holds it
+            # back until the call actually returns.
+            entry.busy = future
+            raise
+
+    @asynccontextmanager
+    async def checkout(self):
+        entry = await self.acquire()
+        try:
+            yield entry
+        except BaseException:
+            # The connection may be what failed, so check it before reuse.
+            entry.suspect = True
+            raise
+        finally:
+            self.release(entry)
+
+    async def acquire(self):
+        start = perf_counter()
+        while True:
+            if self.idle:
+                entry = self.idle.pop()
+            elif self.size < self.max_size:
+                self.size += 1
+                try:
+                    entry = await self._open()
+                except BaseException:
+                    self.size -= 1
+                    self._wake()
+                    raise
+            else:
+                entry = await self._wait()
+
+            if entry is None:
+                continue
+            try:
+                healthy = await self._healthy(entry)
+            except BaseException:
+                self.release(entry)
+                raise
+            if healthy:
+                break
+            self._discard(entry)
+
+        self.metrics.observe(
+            'sql_checkout_wait_seconds', perf_counter() - start
+        )
+        self._set_gauges()
+        return entry
+
+    def release(self, entry):
+        busy, entry.busy = entry.busy, None
+        if busy is not None and not busy.done():
+            busy.add_done_callback(lambda _: self.release(entry))
+            return
+
+        entry.last_used = monotonic()
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(entry)
+                return
+        self.idle.append(entry)
+        self._set_gauges()
+
+    def close(self):
+        while self.idle:
+            self._discard(self.idle.pop())
+
+    async def _wait(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def _wake(self):
+        # A slot freed up without a connection to hand over, so the next
+        # waiter opens its own.
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        attempts = self.retry_policy.attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                conn, cur = await loop.run_in_executor(
+                    self.executor, self.connect
+                )
+                self.metrics.incr('sql_connects')
+                return PooledConnection(conn, cur)
+            except Exception as ex:
+                self.metrics.incr('sql_connect_failures')
+                if attempt == attempts:
+                    raise ProcessingError(
+                        f'SQL Server unreachable after {attempts} '
+                        f'attempts: {ex}'
+                    ) from ex
+
+                delay = self.retry_policy.delay(attempt)
+                self.logger.log_error(
+                    f'SQL connect failed ({ex}). Retrying in '
+                    f'{round(delay, 1)} seconds...'
+                )
+                await asyncio.sleep(delay)
+
+    async def _healthy(self, entry):
+        if not entry.suspect and monotonic() - entry.last_used < (
+            self.check_idle
+        ):
+            return True
+
+        try:
+            await self.run_on(entry, self._ping, entry)
+        except Exception as ex:
+            self.metrics.incr('sql_health_check_failures')
+            self.logger.log_error(f'Dropping dead SQL connection: {ex}')
+            return False
+        entry.suspect = False
+        return True
+
+    def _ping(self, entry):
+        cur = entry.conn.cursor()
+        cur.execute('SELECT 1')
+        cur.fetchall()
+
+    def _discard(self, entry):
+        self.size -= 1
+        with suppress(Exception):
+            entry.conn.close()
+        self._wake()
+        self._set_gauges()
+
+    def _call(self, entry, func, args):
+        self.local.entry = entry
+        try:
+            return func(*args)
+        finally:
+            self.local.entry = None
+
+    def _set_gauges(self):
+        self.metrics.set_gauge('sql_pool_size', self.size)
+        self.metrics.set_gauge('sql_pool_in_use', self.size - len(self.idle))
@@ -4,7 +4,10 @@ from config import HISTORICAL_RUN
 from exceptions import ProcessingError
 from holders import ConfigHolder, DataHolder
 from interfaces import IDataProcessor
+from ledgers import ChangeLedger
 from loggers import EventLogger
+from metrics import RunMetrics
+from records import Record
 from utilities import Utility
 
 
@@ -12,16 +15,26 @@ class SqlStringCreator(IDataProcessor):
     def __init__(
         self,
         data_holder: DataHolder,
-        config_holder: ConfigHolder
+        config_holder: ConfigHolder,
+        ledger: ChangeLedger = None,
+        metrics: RunMetrics = None
     ):
         self.data_holder = data_holder
         self.proc = config_holder.proc
         self.sql_insert_limit = config_holder.sql_insert_limit
+        self.parameterised_sql = config_holder.parameterised_sql
+        self.proc_params = config_holder.proc_params
+        self.ledger = ledger
+        self.metrics = metrics or RunMetrics()
 
     @property
     def asset_ids(self):
         return self.data_holder.asset_ids
 
+    @property
+    def database_data(self):
+        return self.data_holder.database_data
+
     @property
     def xml_data(self):
         return self.data_holder.xml_data
@@ -38,19 +51,30 @@ class SqlStringCreator(IDataProcessor):
     def sql_string(self, new_sql_string):
         self.data_holder.sql_string = new_sql_string
 
+    @property
+    def sql_params(self):
+        return self.data_holder.sql_params
+
+    @sql_params.setter
+    def sql_params(self, new_sql_params):
+        self.data_holder.sql_params = new_sql_params
+
     def process(self):
         sql_dict_list = [{}]
+        split_data = [[]]
+        xml_data = self._changed(self.xml_data)
 
-        if any(self.xml_data):
+        if any(xml_data):
             split_data = Utility.split_list(
-                self.xml_data, self.sql_insert_limit
+                xml_data, self.sql_insert_limit
             )
             sql_dict_list = [
                 Utility.create_sql_insert_str(data)
                 for data in split_data
             ]
 
-        if not HISTORICAL_RUN and self.asset_ids:
+        clears_flags = not HISTORICAL_RUN and bool(self.asset_ids)
+        if clears_flags:
             sql_dict_list[-1] |= Utility.create_asset_id_sql_str(
                 self.asset_ids
             )
@@ -58,6 +82,17 @@ class SqlStringCreator(IDataProcessor):
         if not any(sql_dict_list):
             return False
 
+        self.data_holder.chunk_case_ids = self._chunk_case_ids(
+            split_data, clears_flags
+        )
+
+        if self.parameterised_sql:
+            self.sql_params = (
+                Utility.create_sql_params(sql_dict, self.proc_params)
+                for sql_dict in sql_dict_list
+            )
+            return
+
         result_sql_list = (
             Utility.create_sql_str(sql_dict, self.proc)
             for sql_dict in sql_dict_list
@@ -65,8 +100,42 @@ class SqlStringCreator(IDataProcessor):
 
         self.sql_string = result_sql_list
 
+    def _chunk_case_ids(self, split_data, clears_flags):
+        # A case is done once the chunk with its last record commits. The
+        # last chunk clears the flags, so with AssetIDString every case
+        # waits for it, as do cases without records to write.
+        last = len(split_data) - 1
+        chunk_of = {} if clears_flags else {
+            record.get('AssetID'): n
+            for n, records in enumerate(split_data)
+            for record in records
+        }
+
+        chunk_case_ids = [[] for _ in split_data]
+        for d in self.database_data or ():
+            chunk_case_ids[chunk_of.get(d.get('AssetID'), last)].append(
+                d.get('Case_ID')
+            )
+        return chunk_case_ids
+
+    def _changed(self, xml_data):
+        if self.ledger is None or not any(xml_data):
+            return xml_data
+
+        changed, self.data_holder.ledger_pending = self.ledger.changed(
+            xml_data
+        )
+        self.metrics.incr(
+            'unchanged_records_skipped', len(xml_data) - len(changed)
+        )
+        return changed
+
 
 class DataNormalizer(IDataProcessor):
+    date_columns = {}
+    dt_cache = {}
+    dt_cache_limit = 100_000
+
     def __init__(
         self,
         data_holder: DataHolder
@@ -93,17 +162,59 @@ class DataNormalizer(IDataProcessor):
             raise ProcessingError(f'Error while normalizing data: {e}')
 
     def _normalize_data(self):
+        rows = [(xd, self._get_date_columns(xd)) for xd in self.xml_data]
+        self._convert_dates(rows)
         self.modified_xml_data = [
-            self._normalize_values(xd) for xd in self.xml_data
+            self._normalize_values(xd, date_columns)
+            for xd, date_columns in rows
         ]
 
-    def _normalize_values(self, xd):
-        return {
-            k: 'NULL'
-            if isinstance(v, dict) or v == 'None' else Utility.sqlize_dt(v)
-            if 'date' in str(k) and not isinstance(v, dict) else v
-            for k, v in xd.items()
-        }
+    def _get_date_columns(self, xd):
+        key = xd.schema if isinstance(xd, Record) else tuple(xd)
+        date_columns = self.date_columns.get(key)
+        if date_columns is None:
+            date_columns = tuple('date' in str(k) for k in xd)
+            self.date_columns[key] = date_columns
+        return date_columns
+
+    def _convert_dates(self, rows):
+        dts = list({
+            v: None
+            for xd, date_columns in rows
+            for v, is_date in zip(xd.values(), date_columns)
+            if is_date and isinstance(v, str) and v not in self.dt_cache
+            and v not in ('', 'NULL', 'None')
+        })
+        if not dts:
+            return
+
+        if len(self.dt_cache) + len(dts) > self.dt_cache_limit:
+            self.dt_cache.clear()
+
+        try:
+            self.dt_cache.update(zip(dts, Utility.sqlize_dts(dts)))
+        except (ValueError, TypeError):
+            # Mixed timezones or formats pandas won't parse as one column.
+            self.dt_cache.update((dt, Utility.sqlize_dt(dt)) for dt in dts)
+
+    def _sqlize_dt(self, v):
+        try:
+            return self.dt_cache[v]
+        except (KeyError, TypeError):
+            return Utility.sqlize_dt(v)
+
+    def _normalize_values(self, xd, date_columns):
+        values = [
+            'NULL'
+            if isinstance(v, dict) or v == 'None' else self._sqlize_dt(v)
+            if is_date else v
+            for v, is_date in zip(xd.values(), date_columns)
+        ]
+
+        if isinstance(xd, Record):
+            xd.row[:] = values
+            return xd
+        return dict(zip(xd, values))
 
 
 class XmlProcessor(IDataProcessor):
@@ -123,6 +234,7 @@ class XmlProcessor(IDataProcessor):
         self.soap_fault = config_holder.soap_fault
         self.fault_string = config_holder.fault_string
         self.flag_hour_limit = config_holder.flag_hour_limit
+        self.compact_records = config_holder.compact_records
 
     @property
     def asset_ids(self):
@@ -144,23 +256,78 @@ class XmlProcessor(IDataProcessor):
     def xml_data(self, new_xml_data):
         self.data_holder.xml_data = new_xml_data
 
+    @property
+    def faults(self):
+        return self.data_holder.faults
+
     def process(self):
         try:
             self.result_xml_data = self.xml_data
             self.result_database_data = self.database_data
+            self._split_envelopes()
             self._extract_xml_data()
             self._extract_xml_data_by_keys()
             self._verify_xml_data()
             self.xml_data = self.result_xml_data
             self.database_data = self.result_database_data
         except Exception as e:
-            raise ProcessingError(f'{self._extract_xml_fault_string(e)}')
+            raise ProcessingError(f'Error while processing xml: {e}')
+
+    def _split_envelopes(self):
+        result_xml_list = []
+        result_db_list = []
+
+        for i, xd in enumerate(self.result_xml_data):
+            db_data = (
+                self.result_database_data[i]
+                if i < len(self.result_database_data) else {}
+            )
+
+            # Failed fetches were already reported by XmlGetter.
+            if xd is None:
+                continue
+
+            fault_string = self._get_fault_string(xd)
+            if fault_string is not None:
+                case_id = db_data.get('Case_ID')
+                self.logger.log_error(
+                    f'{db_data.get('AssetID')} / {case_id} -> '
+                    f'SOAP fault: {fault_string}'
+                )
+                self.faults.append((case_id, fault_string))
+                continue
+
+            result_xml_list.append(xd)
+            result_db_list.append(db_data)
+
+        result_db_list.extend(
+            self.result_database_data[len(self.result_xml_data):]
+        )
+        self.result_xml_data = result_xml_list
+        self.result_database_data = result_db_list
+
+    def _get_fault_string(self, xd):
+        try:
+            body = xd[self.soap_env][self.soap_body]
+        except (KeyError, TypeError):
+            return 'malformed SOAP envelope'
+
+        fault = body.get(self.soap_fault) if body else None
+        if fault is not None:
+            return str(
+                fault.get(self.fault_string, fault)
+                if isinstance(fault, dict) else fault
+            )
+
+        if self.ns1_response.format(call=self.call) not in body:
+            return 'missing SOAP response'
+        return None
 
     def _extract_xml_data(self):
         self.result_xml_data = [
             d[self.soap_env][self.soap_body]
             [self.ns1_response.format(call=self.call)]
-            [self.return_key] for d in self.xml_data
+            [self.return_key] for d in self.result_xml_data
         ]
 
     def _extract_xml_data_by_keys(self):
@@ -196,14 +363,24 @@ class XmlProcessor(IDataProcessor):
 
             if any(x_data):
                 asset_id_dict = Utility.get_asset_id_dict(db_data)
-                x_data = ({**xd, **asset_id_dict} for xd in x_data)
+                x_data = (
+                    self._merge_record(xd, asset_id_dict) for xd in x_data
+                ) if self.compact_records else (
+                    {**xd, **asset_id_dict} for xd in x_data
+                )
 
             result_xml_list.extend(x_data)
             result_db_list.append(db_data)
 
-        self.result_xml_data = filter(lambda x: x, result_xml_list)
+        self.result_xml_data = [x for x in result_xml_list if x]
         self.result_database_data = result_db_list
 
+    def _merge_record(self, xd, fields):
+        record = Record.from_dict(xd)
+        for k, v in fields.items():
+            record[k] = v
+        return record
+
     def _check_flag_hours(self, xml_d, db_dict, flag_hours):
         if (
             not HISTORICAL_RUN
@@ -218,12 +395,6 @@ class XmlProcessor(IDataProcessor):
             return False
         return True
 
-    def _extract_xml_fault_string(self, error):
-        return f'{error}: {
-            self.xml_data[self.soap_env][self.soap_body]
-            [self.soap_fault][self.fault_string]
-        }'
-
 
 class AssetIdExtractor(IDataProcessor):
     def __init__(
@@ -0,0 +1,66 @@
+import cProfile
+import linecache
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    def __init__(self, directory: str = 'profiles', top: int = 25):
+        self.directory = directory
+        self.top = top
+        self.profiles = {}
+        self.allocations = {}
+        self.peaks = {}
+        self.active = None
+        self.ignored = (tracemalloc.__file__, linecache.__file__)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, timer):
+        # Only one stage is profiled at a time. Stages that overlap it, such
+        # as the batches inside a pipeline, are counted in it.
+        if self.active is not None:
+            with timer as stage:
+                yield stage
+            return
+
+        self.active = name
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = cProfile.Profile()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile.enable()
+        try:
+            with timer as stage:
+                yield stage
+        finally:
+            profile.disable()
+            after = tracemalloc.take_snapshot()
+            self.peaks[name] = max(
+                self.peaks.get(name, 0), tracemalloc.get_traced_memory()[1]
+            )
+            self.allocations[name] = [
+                diff for diff in after.compare_to(before, 'lineno')
+                if diff.traceback[0].filename not in self.ignored
+            ][:self.top]
+            self.active = None
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.directory, f'{name}.pstats'))
+
+        lines = []
+        for name, diffs in self.allocations.items():
+            lines.append(
+                f'== {name}: peak {self.peaks[name] / 2**20:.1f} MiB traced'
+            )
+            lines.extend(str(diff) for diff in diffs)
+            lines.append('')
+
+        path = os.path.join(self.directory, 'allocations.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines))
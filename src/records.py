@@ -0,0 +1,83 @@
+import sys
+from collections.abc import Mapping
+
+
+class RecordSchema:
+    __slots__ = ('keys', 'index', 'extended')
+
+    registry = {}
+
+    def __init__(self, keys):
+        self.keys = tuple(sys.intern(str(k)) for k in keys)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.extended = {}
+
+    @classmethod
+    def get(cls, keys):
+        keys = tuple(keys)
+        schema = cls.registry.get(keys)
+        if schema is None:
+            schema = cls.registry[keys] = cls(keys)
+        return schema
+
+    def extend(self, key):
+        schema = self.extended.get(key)
+        if schema is None:
+            schema = self.extended[key] = RecordSchema.get((*self.keys, key))
+        return schema
+
+    def __reduce__(self):
+        return (RecordSchema.get, (self.keys,))
+
+
+class Record(Mapping):
+    # Rows of the same shape share one schema, so a row costs a list of
+    # values rather than a dict holding its own copy of every key.
+    __slots__ = ('schema', 'row')
+
+    def __init__(self, schema: RecordSchema, row: list):
+        self.schema = schema
+        self.row = row
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(RecordSchema.get(d.keys()), list(d.values()))
+
+    def __getitem__(self, key):
+        return self.row[self.schema.index[key]]
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.row)
+
+    def __contains__(self, key):
+        return key in self.schema.index
+
+    def __repr__(self):
+        return f'Record({dict(self.items())!r})'
+
+    def __reduce__(self):
+        return (Record, (self.schema, self.row))
+
+    def get(self, key, default=None):
+        i = self.schema.index.get(key)
+        return default if i is None else self.row[i]
+
+    def keys(self):
+        return self.schema.keys
+
+    def values(self):
+        return self.row
+
+    def items(self):
+        return zip(self.schema.keys, self.row)
+
+    def __setitem__(self, key, value):
+        i = self.schema.index.get(key)
+        if i is None:
+            self.schema = self.schema.extend(key)
+            self.row.append(value)
+        else:
+            self.row[i] = value
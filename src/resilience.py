@@ -0,0 +1,194 @@
+import asyncio
+import random
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic
+
+from exceptions import CircuitOpenError
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10
+    ):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        # Full jitter keeps retries from many workers from lining up.
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 20,
+        reset_timeout: float = 30
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def check(self):
+        if self.opened_at is None:
+            return False
+
+        if (
+            self.trial_in_flight
+            or monotonic() - self.opened_at < self.reset_timeout
+        ):
+            raise CircuitOpenError(
+                f'circuit open after {self.failures} consecutive failures'
+            )
+        self.trial_in_flight = True
+        return True
+
+    @contextmanager
+    def attempt(self, retryable=(Exception,)):
+        trial = self.check()
+        try:
+            yield
+        except retryable:
+            self.record_failure()
+            raise
+        except Exception:
+            # Any other error from the trial still reopens the circuit, or
+            # the breaker would wait for its verdict forever.
+            if trial:
+                self.record_failure()
+            raise
+        except BaseException:
+            if trial:
+                self.end_trial()
+            raise
+        else:
+            self.record_success()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = monotonic()
+            self.trial_in_flight = False
+
+    def end_trial(self):
+        # A cancelled trial says nothing about the vendor, so the next
+        # request lets another one through.
+        self.trial_in_flight = False
+
+
+class AdaptiveLimit:
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        backoff: float = 0.9,
+        tolerance: float = 2.0,
+        latency_target: float = None
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.latency_target = latency_target
+        self.baseline = None
+        self.last_drop = 0.0
+        self.in_flight = 0
+        self.waiters = deque()
+
+    @property
+    def saturated(self):
+        return self.in_flight >= int(self.limit)
+
+    async def acquire(self):
+        while self.saturated:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.in_flight += 1
+        return monotonic()
+
+    def release(self, started=None, dropped=False):
+        self.in_flight -= 1
+        if started is not None:
+            if dropped or self._congested(monotonic() - started):
+                self._decrease(started)
+            elif self.in_flight + 1 >= self.limit / 2:
+                # Additive increase of about one per limit's worth of
+                # successes, and only while the limit is actually in use.
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _congested(self, latency):
+        if self.latency_target is not None:
+            return latency > self.latency_target
+
+        if self.baseline is None:
+            self.baseline = latency
+            return False
+        congested = latency > self.baseline * self.tolerance
+        self.baseline += (latency - self.baseline) * 0.01
+        return congested
+
+    def _decrease(self, started):
+        # Requests already in flight when the limit dropped report the same
+        # congestion, so only the first of them backs off.
+        if started < self.last_drop:
+            return
+        self.last_drop = monotonic()
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = monotonic()
+
+    async def acquire(self):
+        now = monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+        # Tokens go negative to queue callers in order, each one sleeping
+        # until its own token is due.
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        delay = -self.tokens / self.rate
+        await asyncio.sleep(delay)
+        return delay
@@ -1,6 +1,7 @@
+import warnings
 from collections import deque
 
-import pandas as pd
+NOW = object()
 
 
 class Utility:
@@ -18,13 +19,16 @@ class Utility:
         return flat
 
     @staticmethod
-    def split_list(dict_list, chunk, new_list=[]):
+    def split_list(dict_list, chunk, new_list=None):
+        if new_list is None:
+            new_list = []
+
         if len(dict_list) > 0:
             new_list.append(dict_list[:chunk])
 
         if len(dict_list) >= chunk:
             dict_list = dict_list[chunk:]
-            return Utility.split_list(dict_list, chunk)
+            return Utility.split_list(dict_list, chunk, new_list)
 
         return new_list
 
@@ -33,7 +37,13 @@ class Utility:
         return {k: v for k, v in db_dict.items() if k == 'AssetID'}
 
     @staticmethod
-    def sqlize_dt(dt=pd.Timestamp.now()):
+    def sqlize_dt(dt=NOW):
+        # pandas is only needed once there are dates to write, so it stays
+        # out of startup.
+        import pandas as pd
+
+        if dt is NOW:
+            dt = pd.Timestamp.now()
         return (
             'NULL' if not dt or dt == 'NULL' or dt == 'None'
             else pd.to_datetime(
@@ -42,23 +52,24 @@ class Utility:
         )
 
     @staticmethod
-    def create_sql_insert_str(dict_list):
-        columns_str = ''
-        values_str = ''
-        xd_keys = list(dict_list[0].keys())
-
-        for i in range(len(xd_keys)):
-            columns_str += xd_keys[i]
-
-            if i < len(xd_keys) - 1:
-                columns_str += ','
-
-        for i in range(len(dict_list)):
-            xd_values = tuple(str(v) for v in dict_list[i].values())
-            values_str += str(xd_values)
+    def sqlize_dts(dts):
+        import pandas as pd
+
+        # pandas 2 returns a plain object Index, with a FutureWarning, for
+        # strings with different UTC offsets; pandas 3 raises instead.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            parsed = pd.to_datetime(dts, format='mixed')
+        if not isinstance(parsed, pd.DatetimeIndex):
+            raise ValueError('dates do not share one UTC offset')
+        return list(parsed.strftime("%Y-%m-%d %H:%M:%S"))
 
-            if i < len(dict_list) - 1:
-                values_str += ','
+    @staticmethod
+    def create_sql_insert_str(dict_list):
+        columns_str = ','.join(dict_list[0].keys())
+        values_str = ','.join(
+            str(tuple(str(v) for v in d.values())) for d in dict_list
+        )
 
         result_dict = {'ColumnString': columns_str}
         result_dict |= {'ValueString': values_str}
@@ -87,10 +98,19 @@ class Utility:
         return list(zip(d_keys, d_values))
 
     def _assemble_sql_string(sql_zip, sql_str=''):
-        v_last = sql_zip[-1]
-        for v in sql_zip[:-1]:
-            sql_str += "=".join(
-                [str(v[0]), "'" + str(v[1]).replace("'", "''") + "'"]) + ","
-        sql_str += "=".join(
-            [str(v_last[0]), "'" + str(v_last[1]).replace("'", "''") + "'"])
+        sql_str += ','.join(
+            "=".join([str(k), "'" + str(v).replace("'", "''") + "'"])
+            for k, v in sql_zip
+        )
         return sql_str.replace("'NULL'", 'NULL')
+
+    @classmethod
+    def create_sql_params(cls, d, param_names):
+        return tuple(cls._sql_param(d.get(name)) for name in param_names)
+
+    def _sql_param(v):
+        # Same value the proc receives from the inlined literal, where
+        # 'NULL' is unquoted both as a whole value and inside ValueString.
+        if v is None or str(v) == 'NULL':
+            return None
+        return str(v).replace("'NULL'", 'NULL')
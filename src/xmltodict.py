@@ -343,6 +343,151 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
         if not encoding:
             encoding = 'utf-8'
         xml_input = xml_input.encode(encoding)
+    parser = _create_parser(handler, encoding, expat, process_namespaces,
+                            namespace_separator, disable_entities,
+                            process_comments)
+    if hasattr(xml_input, 'read'):
+        parser.ParseFile(xml_input)
+    elif isgenerator(xml_input):
+        for chunk in xml_input:
+            parser.Parse(chunk, False)
+        parser.Parse(b'', True)
+    else:
+        parser.Parse(xml_input, True)
+    return handler.item
+
+
+class StreamParser(object):
+    """Push-style counterpart of :func:`parse`.
+
+    Takes the same arguments as `parse`, but the XML is handed over chunk by
+    chunk through `feed` (e.g. straight from a socket) and the result is
+    returned by `close`. Combined with `item_depth` and `item_callback`,
+    items are emitted as soon as their closing tag has been fed::
+
+        >>> parser = xmltodict.StreamParser(item_depth=2, item_callback=handle)
+        >>> for chunk in (b'<a><b>1</b>', b'<b>2</b></a>'):
+        ...     parser.feed(chunk)
+        >>> parser.close()
+    """
+
+    def __init__(self, encoding=None, expat=expat, process_namespaces=False,
+                 namespace_separator=':', disable_entities=True,
+                 process_comments=False, **kwargs):
+        self.handler = _DictSAXHandler(namespace_separator=namespace_separator,
+                                       **kwargs)
+        self.parser = _create_parser(self.handler, encoding, expat,
+                                     process_namespaces, namespace_separator,
+                                     disable_entities, process_comments)
+
+    def feed(self, chunk):
+        self.parser.Parse(chunk, False)
+
+    def close(self):
+        self.parser.Parse(b'', True)
+        return self.handler.item
+
+
+class _PathSAXHandler(_DictSAXHandler):
+    def __init__(self, path, **kwargs):
+        _DictSAXHandler.__init__(self, **kwargs)
+        self.match_path = tuple(path)
+        self.item_level = len(self.match_path)
+        self.reset()
+
+    def reset(self):
+        self.path = []
+        self.stack = []
+        self.data = []
+        self.item = None
+        self.items = self.dict_constructor()
+        self.depth = 0
+        self.matched = 0
+
+    def startElement(self, full_name, attrs):
+        depth = self.depth
+        self.depth = depth + 1
+        if depth < self.item_level:
+            if (self.matched == depth
+                    and self._build_name(full_name) == self.match_path[depth]):
+                self.matched = depth + 1
+        elif self.matched == self.item_level:
+            _DictSAXHandler.startElement(self, full_name, attrs)
+
+    def endElement(self, full_name):
+        self.depth -= 1
+        depth = self.depth
+        if depth < self.item_level:
+            if self.matched > depth:
+                self.matched = depth
+        elif self.matched == self.item_level:
+            _DictSAXHandler.endElement(self, full_name)
+            if depth == self.item_level:
+                name, item = self.item.popitem()
+                self.items.setdefault(name, []).append(item)
+                self.item = None
+                self.data = []
+
+    def characters(self, data):
+        if self.depth > self.item_level and self.matched == self.item_level:
+            _DictSAXHandler.characters(self, data)
+
+
+class PathParser(object):
+    """Builds dicts only for the children of the element at `path`.
+
+    Everything outside that element is skipped at the expat event level, so
+    headers and sibling nodes never become dicts. `close` and `parse` return
+    the children grouped by name, each as a list::
+
+        >>> parser = xmltodict.PathParser(('a', 'b'))
+        >>> parser.parse('<a><h>x</h><b><c>1</c><c>2</c><d>3</d></b></a>')
+        {'c': ['1', '2'], 'd': ['3']}
+
+    The instance can be reused for any number of documents, one at a time.
+    Call `reset` if a document is abandoned part way through.
+    """
+
+    def __init__(self, path, encoding=None, expat=expat,
+                 disable_entities=True, **kwargs):
+        self.handler = _PathSAXHandler(path, **kwargs)
+        self.encoding = encoding
+        self.expat = expat
+        self.disable_entities = disable_entities
+        self.parser = None
+
+    def feed(self, chunk):
+        if self.parser is None:
+            self.handler.reset()
+            self.parser = _create_parser(self.handler, self.encoding,
+                                         self.expat, False, ':',
+                                         self.disable_entities, False)
+        try:
+            self.parser.Parse(chunk, False)
+        except Exception:
+            self.reset()
+            raise
+
+    def reset(self):
+        """Drop any half-parsed document, e.g. after a failed read."""
+        self.parser = None
+
+    def close(self):
+        self.feed(b'')
+        parser, self.parser = self.parser, None
+        parser.Parse(b'', True)
+        items, self.handler.items = self.handler.items, None
+        return items
+
+    def parse(self, xml_input):
+        if isinstance(xml_input, _unicode):
+            xml_input = xml_input.encode(self.encoding or 'utf-8')
+        self.feed(xml_input)
+        return self.close()
+
+
+def _create_parser(handler, encoding, expat, process_namespaces,
+                   namespace_separator, disable_entities, process_comments):
     if not process_namespaces:
         namespace_separator = None
     parser = expat.ParserCreate(
@@ -372,15 +517,7 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
             parser.DefaultHandler = lambda x: None
             # Expects an integer return; zero means failure -> expat.ExpatError.
             parser.ExternalEntityRefHandler = lambda *x: 1
-    if hasattr(xml_input, 'read'):
-        parser.ParseFile(xml_input)
-    elif isgenerator(xml_input):
-        for chunk in xml_input:
-            parser.Parse(chunk, False)
-        parser.Parse(b'', True)
-    else:
-        parser.Parse(xml_input, True)
-    return handler.item
+    return parser
 
 
 def _process_namespace(name, namespaces, ns_sep=':', attr_prefix=''):
@@ -0,0 +1,41 @@
+from checkpoints import Checkpoint
+
+
+def test_checkpoint_records_completed_cases(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.sqlite3'))
+    checkpoint.complete_cases([101, 102, None, ''])
+
+    assert checkpoint.completed_cases() == {'101', '102'}
+
+
+def test_checkpoint_commits_chunk_with_its_cases(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.sqlite3'))
+    digest = Checkpoint.digest('EXEC proc @ValueString = 1')
+
+    assert not checkpoint.has_chunk(digest)
+    checkpoint.commit_chunk(digest, [101, 102])
+
+    assert checkpoint.has_chunk(digest)
+    assert checkpoint.completed_cases() == {'101', '102'}
+
+
+def test_checkpoint_digest_matches_rebuilt_chunks():
+    params = {'ColumnString': 'a,b', 'ValueString': "('1', '2')"}
+
+    assert Checkpoint.digest(params) == Checkpoint.digest(dict(params))
+    assert Checkpoint.digest('EXEC a') != Checkpoint.digest('EXEC b')
+
+
+def test_checkpoint_persists_until_cleared(tmp_path):
+    path = str(tmp_path / 'checkpoint.sqlite3')
+    checkpoint = Checkpoint(path)
+    checkpoint.commit_chunk('abc', [101])
+    checkpoint.close()
+
+    checkpoint = Checkpoint(path)
+    assert checkpoint.has_chunk('abc')
+    assert checkpoint.completed_cases() == {'101'}
+
+    checkpoint.clear()
+    assert not checkpoint.has_chunk('abc')
+    assert checkpoint.completed_cases() == set()
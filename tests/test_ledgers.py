@@ -0,0 +1,59 @@
+from ledgers import ChangeLedger
+
+
+def records(vendor='stub'):
+    return [
+        {'child_case_id': f'100-{n}', 'vendor': vendor, 'AssetID': 900}
+        for n in range(3)
+    ]
+
+
+def test_ledger_skips_recorded_records(tmp_path):
+    ledger = ChangeLedger(str(tmp_path / 'ledger.sqlite3'))
+
+    changed, pending = ledger.changed(records())
+    assert changed == records()
+    ledger.record(pending)
+
+    assert ledger.changed(records()) == ([], [])
+
+
+def test_ledger_only_skips_after_record(tmp_path):
+    ledger = ChangeLedger(str(tmp_path / 'ledger.sqlite3'))
+    ledger.changed(records())
+
+    changed, _ = ledger.changed(records())
+    assert changed == records()
+
+
+def test_ledger_returns_changed_records(tmp_path):
+    ledger = ChangeLedger(str(tmp_path / 'ledger.sqlite3'))
+    ledger.record(ledger.changed(records())[1])
+    updated = records()
+    updated[1]['vendor'] = 'other'
+
+    changed, pending = ledger.changed(updated)
+    assert changed == [updated[1]]
+    assert len(pending) == 1
+
+
+def test_ledger_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'ledger.sqlite3')
+    ledger = ChangeLedger(path)
+    ledger.record(ledger.changed(records())[1])
+    ledger.close()
+
+    assert ChangeLedger(path).changed(records())[0] == []
+
+
+def test_ledger_keys_by_content_without_key_fields(tmp_path, caplog):
+    ledger = ChangeLedger(str(tmp_path / 'ledger.sqlite3'), ('AssetID', 'id'))
+
+    sent = []
+    for _ in range(3):
+        changed, pending = ledger.changed(records())
+        sent.append(len(changed))
+        ledger.record(pending)
+
+    assert sent == [3, 0, 0]
+    assert "['id']" in caplog.text
@@ -0,0 +1,218 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+
+from exceptions import ProcessingError
+from metrics import RunMetrics
+from pools import ConnectionPool
+from resilience import RetryPolicy
+from stubs import install_fake_pymssql
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    # Restores sys.modules['pymssql'] after the test.
+    monkeypatch.setitem(sys.modules, 'pymssql', None)
+    return install_fake_pymssql(rows=1)
+
+
+def make_pool(driver, **kwargs):
+    def connect():
+        conn = driver.connect()
+        return conn, conn.cursor()
+
+    kwargs.setdefault('retry_policy', RetryPolicy(2, 0, 0))
+    return ConnectionPool(connect, metrics=RunMetrics(), **kwargs)
+
+
+def counters(pool):
+    return pool.metrics.summary()['counters']
+
+
+def break_connection(entry):
+    def execute(*args):
+        raise OSError('connection reset')
+
+    entry.conn.cursor = lambda as_dict=False: type(
+        'DeadCursor', (), {'execute': execute}
+    )()
+
+
+def test_fill_opens_min_size_connections(driver):
+    async def go():
+        pool = make_pool(driver, min_size=2, max_size=4)
+        await pool.fill()
+        return pool
+
+    pool = asyncio.run(go())
+    assert driver.logins == 2
+    assert pool.size == 2
+    assert len(pool.idle) == 2
+
+
+def test_run_binds_connection_to_worker_thread(driver):
+    async def go():
+        pool = make_pool(driver)
+        entry = await pool.run(pool.current)
+        return pool, entry
+
+    pool, entry = asyncio.run(go())
+    assert entry is pool.idle[0]
+    assert pool.current() is None
+
+
+def test_checkout_reuses_recent_connection_without_ping(driver):
+    async def go():
+        pool = make_pool(driver)
+        async with pool.checkout() as first:
+            pass
+        async with pool.checkout() as second:
+            pass
+        return first, second
+
+    first, second = asyncio.run(go())
+    assert first is second
+    assert first.conn.statements == 0
+
+
+def test_idle_connection_is_pinged_before_reuse(driver):
+    async def go():
+        pool = make_pool(driver, check_idle=0.05)
+        async with pool.checkout():
+            pass
+        await asyncio.sleep(0.06)
+        async with pool.checkout() as entry:
+            return entry
+
+    entry = asyncio.run(go())
+    assert entry.conn.statements == 1
+
+
+def test_dead_connection_is_replaced(driver):
+    async def go():
+        pool = make_pool(driver, check_idle=0)
+        async with pool.checkout() as dead:
+            break_connection(dead)
+        async with pool.checkout() as entry:
+            return pool, dead, entry
+
+    pool, dead, entry = asyncio.run(go())
+    assert entry is not dead
+    assert pool.size == 1
+    assert counters(pool)['sql_health_check_failures'] == 1
+    assert counters(pool)['sql_connects'] == 2
+
+
+def test_failed_checkout_marks_connection_suspect(driver):
+    async def go():
+        pool = make_pool(driver)
+        with pytest.raises(RuntimeError):
+            async with pool.checkout() as entry:
+                raise RuntimeError('SQL timeout')
+        assert entry.suspect
+
+        async with pool.checkout() as again:
+            return entry, again
+
+    entry, again = asyncio.run(go())
+    assert again is entry
+    assert not entry.suspect
+    assert entry.conn.statements == 1
+
+
+def test_checkout_waits_for_release_at_max_size(driver):
+    async def go():
+        pool = make_pool(driver, min_size=1, max_size=1)
+        order = []
+
+        async def use(name):
+            async with pool.checkout():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(use('a'), use('b'), use('c'))
+        return pool, order
+
+    pool, order = asyncio.run(go())
+    assert order == ['a', 'b', 'c']
+    assert driver.logins == 1
+    assert pool.size == 1
+
+
+def test_cancelled_waiter_does_not_leak_connection(driver):
+    async def go():
+        pool = make_pool(driver, min_size=1, max_size=1)
+        entry = await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        pool.release(entry)
+
+        return pool, await pool.acquire()
+
+    pool, entry = asyncio.run(go())
+    assert entry is not None
+    assert pool.size == 1
+    assert not pool.waiters
+
+
+def test_cancelled_call_holds_connection_until_thread_returns(driver):
+    async def go():
+        pool = make_pool(driver, min_size=1, max_size=1)
+        started, finish = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            finish.wait(5)
+
+        task = asyncio.create_task(pool.run(slow))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        held = len(pool.idle)
+        finish.set()
+        await asyncio.sleep(0.05)
+        return pool, held
+
+    pool, held = asyncio.run(go())
+    assert held == 0
+    assert len(pool.idle) == 1
+    assert pool.size == 1
+
+
+def test_connect_retries_then_raises(driver):
+    def connect():
+        driver.logins += 1
+        raise OSError('login timeout')
+
+    async def go():
+        pool = ConnectionPool(
+            connect, retry_policy=RetryPolicy(3, 0, 0), metrics=RunMetrics()
+        )
+        with pytest.raises(ProcessingError):
+            await pool.acquire()
+        return pool
+
+    pool = asyncio.run(go())
+    assert driver.logins == 3
+    assert pool.size == 0
+    assert counters(pool)['sql_connect_failures'] == 3
+
+
+def test_close_closes_idle_connections(driver):
+    async def go():
+        pool = make_pool(driver, min_size=2)
+        await pool.fill()
+        pool.close()
+        return pool
+
+    pool = asyncio.run(go())
+    assert pool.size == 0
+    assert not pool.idle
@@ -0,0 +1,207 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from exceptions import CircuitOpenError, SoapRequestError
+from resilience import AdaptiveLimit, CircuitBreaker, TokenBucket
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(SoapRequestError):
+            with breaker.attempt(SoapRequestError):
+                raise SoapRequestError('HTTP 503')
+
+
+def test_breaker_opens_at_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    trip(breaker)
+
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_breaker_closes_after_successful_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+
+    with breaker.attempt(SoapRequestError):
+        assert breaker.trial_in_flight
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+    assert not breaker.is_open
+    assert breaker.failures == 0
+    assert breaker.check() is False
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+
+    with pytest.raises(SoapRequestError):
+        with breaker.attempt(SoapRequestError):
+            raise SoapRequestError('HTTP 503')
+
+    assert breaker.is_open
+    assert not breaker.trial_in_flight
+
+
+@pytest.mark.parametrize('error', [ValueError('bad body'), CircuitOpenError()])
+def test_non_retryable_trial_failure_reopens_breaker(error):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+
+    with pytest.raises(type(error)):
+        with breaker.attempt(SoapRequestError):
+            raise error
+
+    assert breaker.is_open
+    assert not breaker.trial_in_flight
+    assert breaker.check() is True
+
+
+def test_cancelled_trial_lets_next_request_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+    failures = breaker.failures
+
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.attempt(SoapRequestError):
+            raise asyncio.CancelledError
+
+    assert breaker.failures == failures
+    assert breaker.check() is True
+
+
+def test_non_retryable_error_outside_trial_is_not_counted():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    with pytest.raises(ValueError):
+        with breaker.attempt(SoapRequestError):
+            raise ValueError('bad body')
+
+    assert breaker.failures == 0
+    assert not breaker.is_open
+
+
+def test_adaptive_limit_queues_past_limit():
+    async def go():
+        limit = AdaptiveLimit(initial=2, max_limit=2)
+        started = [await limit.acquire(), await limit.acquire()]
+        assert limit.saturated
+
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        limit.release(started[0])
+        await waiter
+        return limit
+
+    limit = asyncio.run(go())
+    assert limit.in_flight == 2
+
+
+def test_adaptive_limit_grows_while_in_use():
+    limit = AdaptiveLimit(initial=4, max_limit=5, latency_target=1)
+
+    for _ in range(8):
+        limit.in_flight = int(limit.limit)
+        limit.release(monotonic())
+
+    assert limit.limit > 4
+    assert limit.limit <= 5
+
+
+def test_adaptive_limit_does_not_grow_while_idle():
+    limit = AdaptiveLimit(initial=10, latency_target=1)
+    limit.in_flight = 1
+
+    limit.release(monotonic())
+    assert limit.limit == 10
+
+
+def test_adaptive_limit_backs_off_once_per_window():
+    limit = AdaptiveLimit(initial=10, backoff=0.5, latency_target=1)
+    started = monotonic()
+    limit.in_flight = 2
+
+    limit.release(started, dropped=True)
+    limit.release(started, dropped=True)
+    assert limit.limit == 5
+
+    limit.in_flight = 1
+    limit.release(monotonic(), dropped=True)
+    assert limit.limit == 2.5
+
+
+def test_adaptive_limit_backs_off_on_slow_responses():
+    limit = AdaptiveLimit(initial=10, backoff=0.5, latency_target=1)
+    limit.in_flight = 1
+
+    limit.release(monotonic() - 2)
+    assert limit.limit == 5
+
+
+def test_adaptive_limit_uses_baseline_without_target():
+    limit = AdaptiveLimit(initial=10, backoff=0.5, tolerance=2)
+    limit.in_flight = 1
+    limit.release(monotonic() - 0.1)
+    assert limit.baseline == pytest.approx(0.1, abs=0.05)
+
+    limit.in_flight = 1
+    limit.release(monotonic() - 1)
+    assert limit.limit == 5
+
+
+def test_adaptive_limit_stays_within_bounds():
+    limit = AdaptiveLimit(initial=50, min_limit=2, max_limit=8, backoff=0.5)
+    assert limit.limit == 8
+
+    for _ in range(10):
+        limit.in_flight = 1
+        limit.last_drop = 0
+        limit.release(monotonic(), dropped=True)
+    assert limit.limit == 2
+
+
+def test_adaptive_limit_cancelled_waiter_passes_wake_on():
+    async def go():
+        limit = AdaptiveLimit(initial=1, max_limit=1)
+        started = await limit.acquire()
+        first = asyncio.create_task(limit.acquire())
+        second = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+
+        limit.release(started)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.wait_for(second, 1)
+        return limit
+
+    limit = asyncio.run(go())
+    assert limit.in_flight == 1
+
+
+def test_token_bucket_allows_burst_then_spaces_requests():
+    async def go():
+        bucket = TokenBucket(rate=100, burst=2)
+        return await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+
+    delays = asyncio.run(go())
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] == pytest.approx(0.01, abs=0.005)
+    assert delays[3] == pytest.approx(0.02, abs=0.005)
+
+
+def test_token_bucket_refills_over_time():
+    async def go():
+        bucket = TokenBucket(rate=100, burst=1)
+        await bucket.acquire()
+        await asyncio.sleep(0.02)
+        return await bucket.acquire()
+
+    assert asyncio.run(go()) == 0.0
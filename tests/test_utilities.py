@@ -0,0 +1,29 @@
+import pytest
+
+from utilities import Utility
+
+pytest.importorskip('pandas')
+
+
+@pytest.mark.parametrize('dts', [
+    ['2024-01-05 08:30:00', '2024-02-29T23:59:59', '03/10/2024 1:00 PM'],
+    ['2024-03-09 12:00:00-05:00', '2024-03-09 18:00:00-05:00'],
+    ['2024-01-05'],
+])
+def test_sqlize_dts_matches_sqlize_dt(dts):
+    assert Utility.sqlize_dts(dts) == [Utility.sqlize_dt(dt) for dt in dts]
+
+
+@pytest.mark.parametrize('dts', [
+    # Either side of a DST change.
+    ['2024-03-10 01:00:00-05:00', '2024-03-10 03:00:00-04:00'],
+    ['2024-11-03 01:30:00-04:00', '2024-11-03 01:30:00-05:00'],
+])
+def test_sqlize_dts_rejects_mixed_offsets(dts):
+    # DataNormalizer falls back to sqlize_dt for each value on ValueError.
+    with pytest.raises(ValueError):
+        Utility.sqlize_dts(dts)
+
+    assert [Utility.sqlize_dt(dt) for dt in dts] == [
+        dt[:19] for dt in dts
+    ]
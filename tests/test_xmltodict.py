@@ -0,0 +1,46 @@
+import pytest
+
+import xmltodict
+
+DOC = (
+    b'<env><body><resp><h>x</h><return><c>1</c><c>2</c><d>3</d></return>'
+    b'</resp></body></env>'
+)
+PATH = ('env', 'body', 'resp', 'return')
+
+
+def test_path_parser_returns_children_of_path():
+    parser = xmltodict.PathParser(PATH)
+
+    assert parser.parse(DOC) == {'c': ['1', '2'], 'd': ['3']}
+
+
+def test_path_parser_reuse_across_documents():
+    parser = xmltodict.PathParser(PATH)
+
+    for _ in range(3):
+        assert parser.parse(DOC) == {'c': ['1', '2'], 'd': ['3']}
+
+
+def test_path_parser_feeds_in_chunks():
+    parser = xmltodict.PathParser(PATH)
+    for i in range(0, len(DOC), 7):
+        parser.feed(DOC[i:i + 7])
+
+    assert parser.close() == {'c': ['1', '2'], 'd': ['3']}
+
+
+def test_path_parser_recovers_from_parse_error():
+    parser = xmltodict.PathParser(PATH)
+    with pytest.raises(xmltodict.expat.ExpatError):
+        parser.parse(b'<env><body></env>')
+
+    assert parser.parse(DOC) == {'c': ['1', '2'], 'd': ['3']}
+
+
+def test_path_parser_reset_drops_partial_document():
+    parser = xmltodict.PathParser(PATH)
+    parser.feed(DOC[:30])
+    parser.reset()
+
+    assert parser.parse(DOC) == {'c': ['1', '2'], 'd': ['3']}